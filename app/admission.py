@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from typing import Any, TypeVar
+
+from fastapi import HTTPException, Request, status
+
+from app.config import ADMISSION_CLASSES, ADMISSION_QUEUE_TIMEOUT
+
+EndpointT = TypeVar("EndpointT", bound=Callable[..., Any])
+
+DEFAULT_CLASS = "default"
+
+
+def concurrency_class(name: str | None) -> Callable[[EndpointT], EndpointT]:
+    """
+    Относит обработчик к классу конкурентности admission_control
+    (по умолчанию - "default"); None - без ограничений (метрики, служебные
+    эндпоинты). Декоратор ставится под декоратором маршрута.
+    """
+    if name is not None and name not in ADMISSION_CLASSES:
+        raise ValueError(f"Unknown concurrency class: {name}")
+
+    def decorator(endpoint: EndpointT) -> EndpointT:
+        endpoint.__concurrency_class__ = name
+        return endpoint
+
+    return decorator
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    Ограничивает число одновременно обрабатываемых запросов класса.
+    Сверх лимита запросы ждут в короткой очереди (FIFO) не дольше
+    queue_timeout; при полной очереди или по таймауту - Overloaded.
+    """
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds_total = 0.0
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.max_in_flight and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self.waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # место освободилось одновременно с таймаутом - отдаем его дальше
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+            self.timed_out += 1
+            raise Overloaded
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+            raise
+        finally:
+            self.wait_seconds_total += time.perf_counter() - started
+        self.admitted += 1
+
+    def release(self) -> None:
+        # место передается первому ожидающему без уменьшения in_flight
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds_total": self.wait_seconds_total,
+        }
+
+
+limiters = {
+    name: ConcurrencyLimiter(name, max_in_flight, max_queue, ADMISSION_QUEUE_TIMEOUT)
+    for name, (max_in_flight, max_queue) in ADMISSION_CLASSES.items()
+}
+
+
+def admission_stats() -> dict[str, dict[str, int | float]]:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+async def admission_control(request: Request) -> AsyncIterator[None]:
+    """
+    Управление допуском: запрос занимает место в классе конкурентности своего
+    обработчика раньше остальных зависимостей (и до взятия соединения с базой)
+    и держит его до отправки ответа. При перегрузке класса сразу отвечает 503
+    с Retry-After, поэтому всплеск дорогих запросов (bcrypt, полные списки)
+    не задерживает дешевые.
+    """
+    name = getattr(request.scope.get("endpoint"), "__concurrency_class__", DEFAULT_CLASS)
+    if name is None:
+        yield
+        return
+
+    limiter = limiters[name]
+    try:
+        await limiter.acquire()
+    except Overloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is overloaded, try again later",
+            headers={"Retry-After": str(max(1, round(limiter.queue_timeout)))},
+        )
+    try:
+        yield
+    finally:
+        limiter.release()
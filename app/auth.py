@@ -1,3 +1,8 @@
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta, timezone
@@ -9,9 +14,12 @@ from sqlalchemy import select
 from app.models.users import User as UserModel
 from app.config import SECRET_KEY, ALGORITHM
 from app.db_depends import get_async_db
+from app.cache import MISSING, principal_cache
 from app.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    REFRESH_TOKEN_EXPIRE_DAYS
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE_SIZE,
 )
 
 # создание контекста для хеширования с использованием bcrypt
@@ -20,18 +28,100 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token")
 
 
-def hash_password(password: str) -> str:
+class PasswordHasherPool:
+    """
+    Пул потоков для bcrypt: хеширование занимает сотни миллисекунд и не должно
+    блокировать event loop. Одновременно выполняется не больше workers задач,
+    в очереди ждет не больше max_queue; сверх этого запрос сразу получает 503,
+    так что всплеск логинов замедляет только эндпоинты аутентификации.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hasher"
+        )
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is temporarily overloaded, try again later",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted_at = time.perf_counter()
+
+        def timed_call() -> Any:
+            # время ожидания свободного потока
+            wait = time.perf_counter() - submitted_at
+            self.wait_seconds_total += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            return func(*args)
+
+        loop = asyncio.get_running_loop()
+        job = self._executor.submit(timed_call)
+        self.pending += 1
+        # счетчик следует за задачей в потоке, а не за ожидающим запросом:
+        # при отключении клиента уже начатый bcrypt доработает до конца
+        job.add_done_callback(
+            lambda job: self._call_in_loop(loop, self._job_done, job)
+        )
+        return await asyncio.wrap_future(job)
+
+    @staticmethod
+    def _call_in_loop(
+        loop: asyncio.AbstractEventLoop, callback: Callable[..., Any], *args: Any
+    ) -> None:
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # event loop уже закрыт (остановка приложения)
+            pass
+
+    def _job_done(self, job: Future) -> None:
+        self.pending -= 1
+        if not job.cancelled():
+            self.completed += 1
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": self.wait_seconds_total,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+password_hasher = PasswordHasherPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE)
+
+
+async def hash_password(password: str) -> str:
     """
-    Преобразует пароль в хеш с использованием bcrypt
+    Преобразует пароль в хеш с использованием bcrypt (в пуле потоков)
     """
-    return pwd_context.hash(password)
+    return await password_hasher.run(pwd_context.hash, password)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Проверяет, соответствует ли введенный пароль сохраненному хешу
+    (в пуле потоков)
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await password_hasher.run(
+        pwd_context.verify, plain_password, hashed_password
+    )
 
 
 def create_access_token(data: dict) -> str:
@@ -66,7 +156,9 @@ async def get_current_user(
     db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Проверяет JWT и возвращает пользователя из базы
+    Проверяет JWT и возвращает пользователя.
+    Данные пользователя берутся из короткоживущего кэша, к базе идет запрос
+    только при промахе. Токен со старой версией (claim "ver") считается отозванным.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,7 +173,9 @@ async def get_current_user(
             algorithms=[ALGORITHM],
         )
         email: str = payload.get("sub")
-        if email is None:
+        user_id: int = payload.get("id")
+        token_version: int = payload.get("ver", 0)
+        if email is None or user_id is None:
             raise credentials_exception
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -92,16 +186,37 @@ async def get_current_user(
     except jwt.PyJWTError: # базовый класс, перехватывает все остальные ошибки
         raise credentials_exception
 
-    result = await db.scalars(
-        select(UserModel).where(
-            UserModel.email == email,
-            UserModel.is_active == True,
+    principal = principal_cache.get(("user", user_id))
+    # токен новее закэшированной версии - кэш устарел, перечитываем из базы
+    if principal is MISSING or principal["token_version"] < token_version:
+        generation = principal_cache.generation
+        user = await db.scalar(
+            select(UserModel).where(
+                UserModel.id == user_id,
+                UserModel.is_active == True,
+            )
         )
-    )
-    user = result.first()
-    if user is None:
+        if user is None:
+            raise credentials_exception
+        principal = {
+            "id": user.id,
+            "email": user.email,
+            "role": user.role,
+            "is_active": user.is_active,
+            "token_version": user.token_version,
+        }
+        principal_cache.set(("user", user_id), principal, generation)
+
+    if principal["email"] != email:
         raise credentials_exception
-    return user
+    if principal["token_version"] != token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # несвязанный с сессией объект: обработчикам нужны только его поля
+    return UserModel(**principal)
 
 
 async def get_current_seller(current_user: UserModel = Depends(get_current_user)):
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Hashable
+
+from app.config import BACKGROUND_FLUSH_DELAY
+
+logger = logging.getLogger("app.background")
+
+Job = Callable[[], Awaitable[None]]
+
+
+class CoalescingWorker:
+    """
+    Очередь фоновых задач процесса. Задачи с одинаковым ключом, поставленные
+    до очередного сброса, схлопываются в одну (выполняется последняя).
+    Сброс идет пачкой раз в delay секунд после первой задачи, так что всплеск
+    записей по одному товару дает одну инвалидацию вместо десятков.
+    """
+
+    def __init__(self, name: str, delay: float):
+        self.name = name
+        self.delay = delay
+        self.pending: dict[Hashable, Job] = {}
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.stopping = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.executed = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+
+    def submit(self, key: Hashable, job: Job) -> None:
+        """
+        Ставит задачу в очередь, не дожидаясь выполнения. Воркер запускается
+        при первой задаче, если его не запустил lifespan приложения.
+        """
+        self.submitted += 1
+        if key in self.pending:
+            self.coalesced += 1
+        self.pending[key] = job
+        if not self.stopping:
+            self.start()
+        self.wakeup.set()
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        # задача могла остаться от другого (закрытого) цикла событий
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.stopping = False
+            self.wakeup = asyncio.Event()
+            self.task = loop.create_task(
+                self._run(), name=f"background:{self.name}"
+            )
+
+    async def stop(self) -> None:
+        """
+        Останавливает воркер, выполнив все накопленные задачи.
+        """
+        self.stopping = True
+        if self.task is not None:
+            self.wakeup.set()
+            await self.task
+            self.task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self.stopping:
+            await self.wakeup.wait()
+            if not self.stopping:
+                # даем накопиться задачам, пришедшим следом
+                await asyncio.sleep(self.delay)
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        started = time.perf_counter()
+        for key, job in batch.items():
+            try:
+                await job()
+                self.executed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Background job %r failed", key)
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - started
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "pending": len(self.pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "executed": self.executed,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+# побочные эффекты записей: инвалидация кэша ответов и т.п.
+background = CoalescingWorker("side-effects", BACKGROUND_FLUSH_DELAY)
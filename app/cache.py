@@ -0,0 +1,203 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from app.category_snapshot import category_snapshot
+from app.config import (
+    PRODUCT_CACHE_SIZE,
+    PRODUCT_CACHE_TTL,
+    CATEGORY_CACHE_SIZE,
+    CATEGORY_CACHE_TTL,
+    PRINCIPAL_CACHE_SIZE,
+    PRINCIPAL_CACHE_TTL,
+    REPLICA_MAX_LAG_SECONDS,
+)
+
+# Маркер отсутствия значения: None тоже может быть закэшированным значением
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру LRU-кэш с временем жизни записей.
+    Работает в одном event loop, поэтому блокировки не нужны.
+    Ключи - кортежи, что позволяет удалять записи по префиксу ключа.
+
+    Любое удаление увеличивает generation. Читатель запоминает ее до похода
+    в базу и передает в set(): если за это время была инвалидация, значение
+    могло быть прочитано до записи и не сохраняется.
+
+    Значение, прочитанное с реплики (lagging=True), не сохраняется, если его
+    ключ (или префикс ключа) сбрасывался за последние REPLICA_MAX_LAG_SECONDS:
+    реплика могла еще не получить запись.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self.stale_sets = 0
+        # ключ или префикс -> момент последнего сброса (за окно отставания)
+        self._invalidated: dict[Hashable, float] = {}
+        self._cleared_at = float("-inf")
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Возвращает значение по ключу или MISSING, если его нет или оно устарело.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _mark_invalidated(self, key: Hashable) -> None:
+        self.generation += 1
+        now = time.monotonic()
+        if len(self._invalidated) >= self.maxsize:
+            self._invalidated = {
+                invalidated_key: at
+                for invalidated_key, at in self._invalidated.items()
+                if now - at < REPLICA_MAX_LAG_SECONDS
+            }
+        self._invalidated[key] = now
+
+    def recently_invalidated(self, key: Hashable) -> bool:
+        """
+        Сбрасывались ли ключ, любой его префикс или весь кэш
+        за последние REPLICA_MAX_LAG_SECONDS.
+        """
+        since = time.monotonic() - REPLICA_MAX_LAG_SECONDS
+        if self._cleared_at > since:
+            return True
+        if isinstance(key, tuple):
+            prefixes = [key[:size] for size in range(1, len(key) + 1)]
+        else:
+            prefixes = [key]
+        return any(self._invalidated.get(prefix, since) > since for prefix in prefixes)
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        generation: int | None = None,
+        lagging: bool = False,
+    ) -> None:
+        """
+        Сохраняет значение, вытесняя самые давно использованные записи.
+        generation - значение self.generation на момент начала чтения,
+        lagging - значение прочитано с реплики.
+        """
+        if (generation is not None and generation != self.generation) or (
+            lagging and self.recently_invalidated(key)
+        ):
+            self.stale_sets += 1
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._mark_invalidated(key)
+        self._data.pop(key, None)
+
+    def delete_prefix(self, *prefix: Hashable) -> None:
+        """
+        Удаляет все записи, ключ которых начинается с указанных элементов.
+        """
+        self._mark_invalidated(prefix)
+        size = len(prefix)
+        stale = [
+            key
+            for key in self._data
+            if isinstance(key, tuple) and key[:size] == prefix
+        ]
+        for key in stale:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._cleared_at = time.monotonic()
+        self._invalidated.clear()
+        self._data.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Возвращает размер кэша и счетчики попаданий/промахов.
+        """
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_sets": self.stale_sets,
+        }
+
+
+# ("product", id) - карточка товара,
+# ("category_products", category_id, ...) - страницы товаров категории;
+# значения - пары (ETag, сериализованное тело)
+product_cache = TTLCache("products", PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+# ("categories",) - (ETag, сериализованный список активных категорий),
+# ("tree",) - дерево категорий
+category_cache = TTLCache("categories", CATEGORY_CACHE_SIZE, CATEGORY_CACHE_TTL)
+# ("user", id) - данные пользователя для get_current_user
+principal_cache = TTLCache("principals", PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+
+def invalidate_product(product_id: int, *category_ids: int) -> None:
+    """
+    Сбрасывает кэш товара и страниц категорий, в которых он находится
+    (или находился до изменения).
+    """
+    product_cache.delete(("product", product_id))
+    invalidate_category_products(*category_ids)
+
+
+def invalidate_category_products(*category_ids: int) -> None:
+    """
+    Сбрасывает кэш страниц товаров указанных категорий.
+    """
+    for category_id in set(category_ids):
+        product_cache.delete_prefix("category_products", category_id)
+
+
+def invalidate_categories() -> None:
+    """
+    Сбрасывает кэш и снимок категорий и кэш всех товаров: активность
+    категории влияет на видимость товаров в ней.
+    """
+    category_cache.clear()
+    product_cache.clear()
+    category_snapshot.invalidate()
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Сбрасывает кэш пользователя после деактивации или отзыва токенов.
+    """
+    principal_cache.delete(("user", user_id))
+
+
+def cache_stats() -> dict[str, dict[str, int | float]]:
+    return {
+        cache.name: cache.stats()
+        for cache in (product_cache, category_cache, principal_cache)
+    }
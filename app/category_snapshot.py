@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from app.background import background
+from app.config import CATEGORY_SNAPSHOT_REFRESH_SECONDS
+from app.database import async_session_maker
+from app.models.categories import Category as CategoryModel
+
+logger = logging.getLogger("app.category_snapshot")
+
+
+class CategoryRow(NamedTuple):
+    id: int
+    name: str
+    parent_id: int | None
+
+
+@dataclass(frozen=True)
+class CategorySnapshot:
+    """
+    Неизменяемый снимок активных категорий: id -> строка и id -> дочерние id.
+    """
+
+    categories: Mapping[int, CategoryRow]
+    children: Mapping[int | None, tuple[int, ...]]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def from_rows(cls, rows: list[CategoryRow]) -> "CategorySnapshot":
+        children: dict[int | None, list[int]] = {}
+        for row in rows:
+            children.setdefault(row.parent_id, []).append(row.id)
+        return cls(
+            categories=MappingProxyType({row.id: row for row in rows}),
+            children=MappingProxyType(
+                {parent_id: tuple(ids) for parent_id, ids in children.items()}
+            ),
+        )
+
+
+class CategorySnapshotHolder:
+    """
+    Держит текущий снимок категорий процесса. Снимок заменяется целиком
+    (одним присваиванием), поэтому читатели никогда не видят его частично.
+    Обновляется по таймеру и после записей в категории; до загрузки нового
+    снимка после записи проверки идут в базу.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.current: CategorySnapshot | None = None
+        self.task: asyncio.Task | None = None
+        # растет при каждом сбросе: снимок, загрузка которого началась
+        # до записи, не должен заменить сброшенный
+        self.generation = 0
+        self.refreshes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def is_active(self, category_id: int) -> bool:
+        """
+        True, если категория активна по снимку. False означает "неизвестно":
+        снимка нет, он сброшен записью или категория создана другим процессом
+        после загрузки, - вызывающий проверяет по базе.
+        """
+        snapshot = self.current
+        if snapshot is not None and category_id in snapshot.categories:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    async def refresh(self) -> None:
+        generation = self.generation
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(
+                    CategoryModel.id, CategoryModel.name, CategoryModel.parent_id
+                ).where(CategoryModel.is_active == True)
+            )
+            rows = [CategoryRow(*row) for row in result.all()]
+        if generation != self.generation:
+            return
+        self.current = CategorySnapshot.from_rows(rows)
+        self.refreshes += 1
+
+    def invalidate(self) -> None:
+        """
+        Сбрасывает снимок после записи в категории и ставит загрузку нового
+        в фоновый воркер (повторные записи схлопываются в одну загрузку).
+        """
+        self.current = None
+        self.generation += 1
+        background.submit(("category_snapshot",), self.refresh)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Category snapshot refresh failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(
+                self._run(), name="category-snapshot"
+            )
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def stats(self) -> dict[str, int | float | None]:
+        snapshot = self.current
+        return {
+            "size": None if snapshot is None else len(snapshot.categories),
+            "age_seconds": None
+            if snapshot is None
+            else time.monotonic() - snapshot.loaded_at,
+            "refreshes": self.refreshes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+category_snapshot = CategorySnapshotHolder(CATEGORY_SNAPSHOT_REFRESH_SECONDS)
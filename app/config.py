@@ -3,6 +3,14 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 
@@ -14,3 +22,112 @@ POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES") or 30
 REFRESH_TOKEN_EXPIRE_DAYS = os.getenv("REFRESH_TOKEN_EXPIRE_DAYS") or 7
+
+# Пагинация списков
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE") or 20)
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE") or 100)
+# Максимум ID в одном запросе GET /products/batch
+PRODUCT_BATCH_MAX_IDS = int(os.getenv("PRODUCT_BATCH_MAX_IDS") or 100)
+
+# Кэш чтения товаров и категорий в памяти процесса
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE") or 10_000)
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL") or 60)
+CATEGORY_CACHE_SIZE = int(os.getenv("CATEGORY_CACHE_SIZE") or 100)
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL") or 300)
+# Снимок активных категорий для проверок в обработчиках товаров:
+# период полной перезагрузки, секунды
+CATEGORY_SNAPSHOT_REFRESH_SECONDS = float(
+    os.getenv("CATEGORY_SNAPSHOT_REFRESH_SECONDS") or 60
+)
+
+# Хеширование паролей в отдельном пуле потоков
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS") or min(4, os.cpu_count() or 1)
+)
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE") or 32)
+
+# Управление допуском (зависимость admission_control): класс конкурентности ->
+# (одновременно обрабатываемых запросов, мест в очереди)
+ADMISSION_ENABLED = _env_bool("ADMISSION_ENABLED", True)
+ADMISSION_CLASSES = {
+    # вход, регистрация, обновление токена - bcrypt
+    "auth": (
+        int(os.getenv("ADMISSION_AUTH_CONCURRENCY") or 8),
+        int(os.getenv("ADMISSION_AUTH_QUEUE") or 16),
+    ),
+    # полные списки, поиск, выгрузка и импорт
+    "heavy": (
+        int(os.getenv("ADMISSION_HEAVY_CONCURRENCY") or 16),
+        int(os.getenv("ADMISSION_HEAVY_QUEUE") or 32),
+    ),
+    "default": (
+        int(os.getenv("ADMISSION_DEFAULT_CONCURRENCY") or 64),
+        int(os.getenv("ADMISSION_DEFAULT_QUEUE") or 128),
+    ),
+}
+# Сколько секунд запрос может ждать места в очереди класса
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT") or 1)
+
+# Кэш пользователей, прошедших аутентификацию по JWT
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE") or 10_000)
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL") or 30)
+
+# Массовый импорт товаров
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE") or 5000)
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS") or 1000)
+
+# Потоковая выгрузка каталога: строк в одном чанке серверного курсора
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE") or 1000)
+# Запас в секундах для точки продолжения выгрузки (X-Export-Watermark):
+# покрывает длительность пишущих транзакций, отставание реплик и расхождение часов
+EXPORT_WATERMARK_MARGIN = float(os.getenv("EXPORT_WATERMARK_MARGIN") or 300)
+
+# Шина инвалидации кэшей между процессами (LISTEN/NOTIFY)
+INVALIDATION_BUS_ENABLED = _env_bool("INVALIDATION_BUS_ENABLED", True)
+# отдельный адрес для LISTEN (postgresql://...), если основной ведет в PgBouncer
+INVALIDATION_BUS_URL = os.getenv("INVALIDATION_BUS_URL")
+# период проверки соединения слушателя и пауза перед переподключением, секунды
+INVALIDATION_BUS_HEALTH_INTERVAL = float(os.getenv("INVALIDATION_BUS_HEALTH_INTERVAL") or 10)
+INVALIDATION_BUS_RETRY_DELAY = float(os.getenv("INVALIDATION_BUS_RETRY_DELAY") or 1)
+
+# Фоновые побочные эффекты записей: сколько секунд копить задачи перед сбросом
+BACKGROUND_FLUSH_DELAY = float(os.getenv("BACKGROUND_FLUSH_DELAY") or 0.05)
+
+# Токен для GET /metrics (Authorization: Bearer <токен>); не задан - метрики выключены
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+
+# Подключение к базе данных и пул соединений
+DB_ECHO = _env_bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or 5)
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW") or 10)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or 30)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE") or 1800)
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# размер кэша подготовленных выражений asyncpg на соединение
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE") or 100)
+# работа через PgBouncer в режиме transaction: без кэша подготовленных выражений
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER", False)
+
+# Реплики для чтения: URL через запятую (postgresql+asyncpg://...).
+# Если не заданы, чтение идет в основную базу
+READ_REPLICA_URLS = [
+    url.strip()
+    for url in (os.getenv("READ_REPLICA_URLS") or "").split(",")
+    if url.strip()
+]
+# Сколько секунд после записи клиент читает из основной базы (0 - выключено)
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS") or 5)
+# Допустимое отставание реплик: столько секунд после инвалидации кэши
+# не заполняются данными, прочитанными с реплики
+REPLICA_MAX_LAG_SECONDS = float(
+    os.getenv("REPLICA_MAX_LAG_SECONDS") or max(READ_YOUR_WRITES_SECONDS, 1)
+)
+
+# Кэш ответов публичных GET-запросов (ResponseCacheMiddleware):
+# "memory" - в памяти процесса, "redis" - общий (нужен пакет redis), "none" - выключен
+RESPONSE_CACHE_BACKEND = (os.getenv("RESPONSE_CACHE_BACKEND") or "memory").lower()
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL") or "redis://localhost:6379/0"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE") or 5000)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL") or 30)
+# max-age в Cache-Control для клиентов и прокси
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE") or 5)
@@ -23,20 +23,132 @@ from app.config import (
 
 # ------- асинхронное подключение к PostgreSQL -------
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import itertools
+import time
+from uuid import uuid4
+
+from sqlalchemy import exc, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    create_async_engine,
+    async_sessionmaker,
+    AsyncSession,
+)
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config import (
+    DB_ECHO,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_PGBOUNCER,
+    READ_REPLICA_URLS,
+)
 
 DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
-async_engine = create_async_engine(
-    url=DATABASE_URL,
-    echo=True,
-)
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, считающий время ожидания соединения и случаи исчерпания
+    пула (все соединения заняты, включая overflow).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.saturated_checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        # соединений нет ни свободных, ни в запасе overflow - придется ждать
+        if self.checkedin() == 0 and self.overflow() >= self._max_overflow:
+            self.saturated_checkouts += 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "saturated_checkouts": self.saturated_checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+def create_engine_for(url: str) -> AsyncEngine:
+    """
+    Создает асинхронный движок с настройками пула из app.config.
+    """
+    connect_args = {}
+    if DB_PGBOUNCER:
+        # PgBouncer в режиме transaction не сохраняет подготовленные выражения
+        # между транзакциями, поэтому кэши выключены, а имена уникальны
+        statement_cache_size = 0
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    else:
+        statement_cache_size = DB_STATEMENT_CACHE_SIZE
+
+    return create_async_engine(
+        url=make_url(url).update_query_dict(
+            {"prepared_statement_cache_size": str(statement_cache_size)}
+        ),
+        echo=DB_ECHO,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+async_engine = create_engine_for(DATABASE_URL)
 
 async_session_maker = async_sessionmaker(
     async_engine, expire_on_commit=False, class_=AsyncSession
 )
 
+# Движки реплик для чтения; без реплик чтение идет в основную базу
+read_engines = [create_engine_for(url) for url in READ_REPLICA_URLS]
+read_session_makers = [
+    async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    for engine in read_engines
+] or [async_session_maker]
+_read_session_makers_cycle = itertools.cycle(read_session_makers)
+
+
+def next_read_session_maker() -> async_sessionmaker[AsyncSession]:
+    """
+    Возвращает фабрику сессий следующей реплики (по кругу).
+    """
+    return next(_read_session_makers_cycle)
+
 
 class Base(DeclarativeBase):
     pass
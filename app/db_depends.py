@@ -19,8 +19,10 @@ from fastapi import Depends
 # ------- Асинхронная версия -------
 
 from collections.abc import AsyncGenerator
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import async_session_maker
+from app.database import async_session_maker, next_read_session_maker
+from app.middleware import is_pinned_to_primary
 
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """
@@ -28,3 +30,25 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """
     async with async_session_maker() as session:
         yield session
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Предоставляет сессию только для чтения: реплики выбираются по кругу.
+    Клиент, недавно выполнявший запись, читает из основной базы.
+    Чтение с реплики помечается (is_replica_session, scope["read_replica"]),
+    чтобы кэши не заполнялись данными, которые могли отстать от записи.
+    """
+    if is_pinned_to_primary(request):
+        session_maker = async_session_maker
+    else:
+        session_maker = next_read_session_maker()
+    async with session_maker() as session:
+        if session_maker is not async_session_maker:
+            session.info["replica"] = True
+            request.scope["read_replica"] = True
+        yield session
+
+
+def is_replica_session(session: AsyncSession) -> bool:
+    return session.info.get("replica", False)
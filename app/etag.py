@@ -0,0 +1,44 @@
+import hashlib
+from typing import Any
+
+from fastapi import Response, status
+
+from app.serialization import json_response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Строгий ETag по версии данных (id, updated_at и т.п.), а не по телу ответа:
+    его можно посчитать до загрузки и сериализации строк.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Проверяет заголовок If-None-Match (список ETag или "*").
+    Для If-None-Match сравнение слабое, поэтому префикс W/ игнорируется.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def conditional_response(
+    if_none_match: str | None, etag: str, content: bytes
+) -> Response:
+    """
+    304 без тела, если клиент уже получил эту версию, иначе JSON с ETag.
+    """
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return json_response(content, headers={"ETag": etag})
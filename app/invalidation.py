@@ -0,0 +1,223 @@
+import asyncio
+import logging
+from collections.abc import Sequence
+from typing import Any
+from uuid import uuid4
+
+import asyncpg
+import orjson
+from sqlalchemy import func, make_url, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.background import background
+from app.cache import (
+    category_cache,
+    invalidate_categories,
+    invalidate_category_products,
+    invalidate_product,
+    invalidate_user,
+    principal_cache,
+    product_cache,
+)
+from app.category_snapshot import category_snapshot
+from app.config import (
+    INVALIDATION_BUS_ENABLED,
+    INVALIDATION_BUS_HEALTH_INTERVAL,
+    INVALIDATION_BUS_RETRY_DELAY,
+    INVALIDATION_BUS_URL,
+)
+from app.database import DATABASE_URL
+from app.response_cache import (
+    MemoryBackend,
+    mark_responses_invalidated,
+    response_cache,
+    schedule_response_invalidation,
+)
+
+logger = logging.getLogger("app.invalidation")
+
+CHANNEL = "cache_invalidation"
+# Идентификатор процесса: свои события он применяет сам после коммита
+ORIGIN = uuid4().hex[:12]
+# Предел payload у NOTIFY - 8000 байт; длинный список заменяется полным сбросом
+MAX_PAYLOAD_SIZE = 7900
+
+# События - короткие JSON-массивы: [вид, аргументы...]
+Event = list[Any]
+
+
+def product_changed(product_id: int, *category_ids: int) -> Event:
+    return ["product", product_id, sorted(set(category_ids))]
+
+
+def category_products_changed(*category_ids: int) -> Event:
+    return ["category_products", sorted(set(category_ids))]
+
+
+def categories_changed() -> Event:
+    return ["categories"]
+
+
+def user_changed(user_id: int) -> Event:
+    return ["user", user_id]
+
+
+def responses_changed(*tags: str) -> Event:
+    return ["responses", list(tags)]
+
+
+def flush_local_caches() -> None:
+    """
+    Сбрасывает все кэши процесса: применяется, когда события могли быть потеряны.
+    """
+    product_cache.clear()
+    category_cache.clear()
+    principal_cache.clear()
+    category_snapshot.invalidate()
+    if isinstance(response_cache, MemoryBackend):
+        background.submit(("responses", "*"), response_cache.clear)
+
+
+def apply_events(events: Sequence[Event], *, remote: bool = False) -> None:
+    """
+    Применяет события к кэшам процесса. Писавший процесс вызывает ее сам
+    после коммита, остальные - при получении NOTIFY (remote=True). Общий
+    кэш ответов в Redis уже сброшен писавшим процессом, поэтому чужие
+    события трогают только кэш ответов в памяти.
+    """
+    for kind, *args in events:
+        if kind == "product":
+            invalidate_product(args[0], *args[1])
+        elif kind == "category_products":
+            invalidate_category_products(*args[0])
+        elif kind == "categories":
+            invalidate_categories()
+        elif kind == "user":
+            invalidate_user(args[0])
+        elif kind == "responses":
+            if not remote or isinstance(response_cache, MemoryBackend):
+                schedule_response_invalidation(*args[0])
+            else:
+                # общий кэш уже сброшен писавшим процессом; отмечаем
+                # инвалидацию, чтобы не сохранить ответ с отстающей реплики
+                mark_responses_invalidated()
+        elif kind == "flush":
+            flush_local_caches()
+        else:
+            logger.warning("Unknown invalidation event %r", kind)
+
+
+async def publish(db: AsyncSession, *events: Event) -> None:
+    """
+    Публикует события в канал через pg_notify в транзакции сессии:
+    другие процессы получат их только после коммита и только если он удался.
+    Вызывается перед commit(); сам процесс затем вызывает apply_events().
+    """
+    if not INVALIDATION_BUS_ENABLED:
+        return
+    payload = orjson.dumps({"o": ORIGIN, "e": events})
+    if len(payload) > MAX_PAYLOAD_SIZE:
+        payload = orjson.dumps({"o": ORIGIN, "e": [["flush"]]})
+    await db.execute(select(func.pg_notify(CHANNEL, payload.decode())))
+
+
+class InvalidationListener:
+    """
+    Слушает канал инвалидации на отдельном соединении asyncpg (не из пула:
+    LISTEN держит соединение все время жизни процесса). После каждого
+    подключения, в том числе повторного, сбрасывает все локальные кэши:
+    события, отправленные пока соединения не было, потеряны. Обрыв
+    обнаруживается по закрытию соединения и периодическому SELECT 1.
+    """
+
+    def __init__(self, dsn: str, health_interval: float, retry_delay: float):
+        self.dsn = dsn
+        self.health_interval = health_interval
+        self.retry_delay = retry_delay
+        self.task: asyncio.Task | None = None
+        self.connected = False
+        self.connects = 0
+        self.received = 0
+        self.skipped_own = 0
+        self.errors = 0
+
+    def on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = orjson.loads(payload)
+            if message["o"] == ORIGIN:
+                self.skipped_own += 1
+                return
+            apply_events(message["e"], remote=True)
+            self.received += 1
+        except Exception:
+            self.errors += 1
+            logger.exception("Bad invalidation event %r", payload)
+
+    async def listen_once(self) -> None:
+        connection = await asyncpg.connect(self.dsn)
+        lost = asyncio.Event()
+        connection.add_termination_listener(lambda _: lost.set())
+        try:
+            await connection.add_listener(CHANNEL, self.on_notification)
+            flush_local_caches()
+            self.connected = True
+            self.connects += 1
+            while not lost.is_set():
+                try:
+                    await asyncio.wait_for(lost.wait(), self.health_interval)
+                except asyncio.TimeoutError:
+                    await asyncio.wait_for(
+                        connection.fetchval("SELECT 1"), self.health_interval
+                    )
+        finally:
+            self.connected = False
+            connection.terminate()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.listen_once()
+            except Exception:
+                self.errors += 1
+                logger.warning(
+                    "Invalidation listener disconnected, reconnecting in %s s",
+                    self.retry_delay,
+                    exc_info=True,
+                )
+            await asyncio.sleep(self.retry_delay)
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(
+                self._run(), name="invalidation-listener"
+            )
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def stats(self) -> dict[str, int | bool]:
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "received": self.received,
+            "skipped_own": self.skipped_own,
+            "errors": self.errors,
+        }
+
+
+invalidation_listener = InvalidationListener(
+    # LISTEN не работает через PgBouncer в режиме transaction,
+    # поэтому адрес можно задать отдельно
+    INVALIDATION_BUS_URL
+    or make_url(DATABASE_URL)
+    .set(drivername="postgresql")
+    .render_as_string(hide_password=False),
+    INVALIDATION_BUS_HEALTH_INTERVAL,
+    INVALIDATION_BUS_RETRY_DELAY,
+)
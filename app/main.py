@@ -1,18 +1,57 @@
-from fastapi import FastAPI
+import secrets
+from contextlib import asynccontextmanager
+from typing import Annotated
 
-from app.routers import categories, products, users, reviews
+from fastapi import Depends, FastAPI, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.routers import categories, products, users, reviews, internal
+from app.background import background
+from app.category_snapshot import category_snapshot
+from app.admission import admission_control, concurrency_class
+from app.config import ADMISSION_ENABLED, INVALIDATION_BUS_ENABLED, METRICS_TOKEN
+from app.invalidation import invalidation_listener
+from app.middleware import ReadYourWritesMiddleware
+from app.metrics import MetricsMiddleware, instrument_engine, registry
+from app.response_cache import ResponseCacheMiddleware
+from app.database import async_engine, read_engines
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background.start()
+    category_snapshot.start()
+    if INVALIDATION_BUS_ENABLED:
+        invalidation_listener.start()
+    yield
+    await invalidation_listener.stop()
+    await category_snapshot.stop()
+    # выполнить накопленные побочные эффекты до остановки процесса
+    await background.stop()
 
 
 app = FastAPI(
     title="FastAPI Интернет-магазин",
     version="0.1.0",
+    lifespan=lifespan,
+    # управление допуском - до остальных зависимостей каждого обработчика
+    dependencies=[Depends(admission_control)] if ADMISSION_ENABLED else [],
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(ResponseCacheMiddleware)
+# добавляется последним, поэтому стоит снаружи и замеряет весь запрос
+app.add_middleware(MetricsMiddleware)
+
+for engine in (async_engine, *read_engines):
+    instrument_engine(engine)
+
 # Подключение маршрутов категорий и товаров
 app.include_router(categories.router)
 app.include_router(products.router)
 app.include_router(users.router)
 app.include_router(reviews.router)
+app.include_router(internal.router)
 
 
 # Корневой endpoint для проверки
@@ -22,3 +61,20 @@ async def root():
     Корневой маршрут, подтверждающий, что API работает.
     """
     return {"message": "Добро пожаловать в API интернет-магазина!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+@concurrency_class(None)
+async def metrics(authorization: Annotated[str | None, Header()] = None):
+    """
+    Метрики приложения в текстовом формате Prometheus. Доступны только
+    с заголовком "Authorization: Bearer <METRICS_TOKEN>"; без METRICS_TOKEN
+    эндпоинт выключен.
+    """
+    if METRICS_TOKEN is None or not secrets.compare_digest(
+        (authorization or "").encode(), f"Bearer {METRICS_TOKEN}".encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,444 @@
+import bisect
+import collections
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.admission import admission_stats
+from app.auth import password_hasher
+from app.background import background
+from app.cache import cache_stats
+from app.database import async_engine, read_engines
+from app.invalidation import invalidation_listener
+from app.query_budget import check_request_queries
+from app.response_cache import response_cache_stats
+
+# Границы корзин гистограмм (секунды и штуки)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """
+    Монотонно растущий счетчик с метками.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(labels.items())
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    """
+    Значение, которое может и расти, и уменьшаться.
+    """
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами; наблюдение стоит один bisect.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # по меткам: счетчики корзин (последняя - +Inf), сумма
+        self.values: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.items())
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = entry
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                bucket_labels = (*labels, ("le", le))
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class CallbackGauge:
+    """
+    Метрика, значения которой вычисляются в момент выгрузки
+    (размеры кэшей, состояние пулов и т.п.).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], dict[Labels, float]],
+        kind: str = "gauge",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(labels)} {value}"
+            for labels, value in self.collect().items()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram | CallbackGauge] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(
+    Counter("http_requests_total", "Число HTTP-запросов по маршруту и коду ответа")
+)
+http_requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "Число запросов, обрабатываемых сейчас")
+)
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Время обработки запроса по маршруту",
+        LATENCY_BUCKETS,
+    )
+)
+db_queries_per_request = registry.register(
+    Histogram(
+        "db_queries_per_request",
+        "Число SQL-запросов на один HTTP-запрос",
+        QUERY_COUNT_BUCKETS,
+    )
+)
+db_time_per_request_seconds = registry.register(
+    Histogram(
+        "db_time_per_request_seconds",
+        "Суммарное время SQL-запросов на один HTTP-запрос",
+        LATENCY_BUCKETS,
+    )
+)
+db_query_budget_exceeded_total = registry.register(
+    Counter(
+        "db_query_budget_exceeded_total",
+        "Запросы, превысившие объявленный для маршрута бюджет SQL-запросов",
+    )
+)
+
+
+def _cache_stat(field: str) -> Callable[[], dict[Labels, float]]:
+    return lambda: {
+        (("cache", name),): stats[field] for name, stats in cache_stats().items()
+    }
+
+
+def _pool_stat(field: str) -> Callable[[], dict[Labels, float]]:
+    def collect() -> dict[Labels, float]:
+        pools = {"primary": async_engine.pool}
+        for number, engine in enumerate(read_engines):
+            pools[f"replica{number}"] = engine.pool
+        return {
+            (("engine", name),): pool.stats()[field] for name, pool in pools.items()
+        }
+
+    return collect
+
+
+def _hasher_stat(field: str) -> Callable[[], dict[Labels, float]]:
+    return lambda: {(): password_hasher.stats()[field]}
+
+
+def _admission_stat(field: str) -> Callable[[], dict[Labels, float]]:
+    return lambda: {
+        (("class", name),): stats[field] for name, stats in admission_stats().items()
+    }
+
+
+for _name, _documentation, _collect, _kind in (
+    ("cache_entries", "Число записей в кэше", _cache_stat("size"), "gauge"),
+    ("cache_hits_total", "Попадания в кэш", _cache_stat("hits"), "counter"),
+    ("cache_misses_total", "Промахи кэша", _cache_stat("misses"), "counter"),
+    (
+        "response_cache_hits_total",
+        "Ответы, отданные из кэша ответов",
+        lambda: {(): response_cache_stats["hits"]},
+        "counter",
+    ),
+    (
+        "response_cache_misses_total",
+        "Кэшируемые ответы, сформированные обработчиком",
+        lambda: {(): response_cache_stats["misses"]},
+        "counter",
+    ),
+    (
+        "db_pool_checked_out",
+        "Занятые соединения пула",
+        _pool_stat("checked_out"),
+        "gauge",
+    ),
+    (
+        "db_pool_wait_seconds_total",
+        "Суммарное время ожидания соединения",
+        _pool_stat("wait_seconds_total"),
+        "counter",
+    ),
+    (
+        "db_pool_saturated_checkouts_total",
+        "Запросы соединения при исчерпанном пуле",
+        _pool_stat("saturated_checkouts"),
+        "counter",
+    ),
+    (
+        "db_pool_timeouts_total",
+        "Таймауты ожидания соединения",
+        _pool_stat("timeouts"),
+        "counter",
+    ),
+    (
+        "password_hasher_queued",
+        "Задачи bcrypt в очереди",
+        _hasher_stat("queued"),
+        "gauge",
+    ),
+    (
+        "password_hasher_in_flight",
+        "Выполняющиеся задачи bcrypt",
+        _hasher_stat("in_flight"),
+        "gauge",
+    ),
+    (
+        "password_hasher_rejected_total",
+        "Отклоненные из-за перегрузки задачи bcrypt",
+        _hasher_stat("rejected"),
+        "counter",
+    ),
+    (
+        "background_pending_jobs",
+        "Фоновые задачи, ожидающие сброса",
+        lambda: {(): background.stats()["pending"]},
+        "gauge",
+    ),
+    (
+        "background_jobs_total",
+        "Выполненные фоновые задачи",
+        lambda: {(): background.stats()["executed"]},
+        "counter",
+    ),
+    (
+        "background_coalesced_jobs_total",
+        "Фоновые задачи, схлопнутые с уже ожидающими",
+        lambda: {(): background.stats()["coalesced"]},
+        "counter",
+    ),
+    (
+        "background_failed_jobs_total",
+        "Фоновые задачи, завершившиеся ошибкой",
+        lambda: {(): background.stats()["failed"]},
+        "counter",
+    ),
+    (
+        "invalidation_bus_connected",
+        "Подключен ли слушатель шины инвалидации (1/0)",
+        lambda: {(): int(invalidation_listener.stats()["connected"])},
+        "gauge",
+    ),
+    (
+        "invalidation_bus_connects_total",
+        "Подключения слушателя шины инвалидации (каждое сбрасывает кэши)",
+        lambda: {(): invalidation_listener.stats()["connects"]},
+        "counter",
+    ),
+    (
+        "invalidation_bus_events_total",
+        "События инвалидации, полученные от других процессов",
+        lambda: {(): invalidation_listener.stats()["received"]},
+        "counter",
+    ),
+    (
+        "admission_in_flight",
+        "Запросы, обрабатываемые сейчас, по классу конкурентности",
+        _admission_stat("in_flight"),
+        "gauge",
+    ),
+    (
+        "admission_queued",
+        "Запросы, ожидающие места в классе конкурентности",
+        _admission_stat("queued"),
+        "gauge",
+    ),
+    (
+        "admission_rejected_total",
+        "Запросы, отклоненные из-за переполнения очереди класса",
+        _admission_stat("rejected"),
+        "counter",
+    ),
+    (
+        "admission_timeouts_total",
+        "Запросы, не дождавшиеся места в очереди класса",
+        _admission_stat("timed_out"),
+        "counter",
+    ),
+    (
+        "admission_wait_seconds_total",
+        "Суммарное время ожидания в очереди класса",
+        _admission_stat("wait_seconds_total"),
+        "counter",
+    ),
+):
+    registry.register(CallbackGauge(_name, _documentation, _collect, _kind))
+
+
+@dataclass
+class RequestStats:
+    """
+    Статистика SQL-запросов текущего HTTP-запроса.
+    """
+
+    queries: int = 0
+    db_time: float = 0.0
+    # текст запроса -> сколько раз выполнен; нормализуется только в конце запроса
+    statements: collections.Counter[str] = field(default_factory=collections.Counter)
+
+
+# Статистика текущего запроса; события движка дописывают в нее по мере выполнения
+current_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.statements[statement] += 1
+        stats.db_time += time.perf_counter() - context._query_started_at
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Подключает подсчет числа и времени SQL-запросов к движку.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    Считает время ответа, коды ответов, число запросов в обработке,
+    а также число и время SQL-запросов по маршрутам; проверяет бюджет
+    SQL-запросов обработчика и повторяющиеся запросы (см. app.query_budget).
+    Метки маршрута берутся из шаблона пути ("/products/{product_id}"),
+    чтобы число временных рядов не зависело от идентификаторов в URL.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            http_requests_in_flight.dec(method=method)
+            current_request_stats.reset(token)
+            route = scope.get("route")
+            # ответы из кэша ответов не проходят маршрутизацию
+            path = getattr(route, "path", None) or scope.get("route_path", "unmatched")
+            http_requests_total.inc(
+                method=method, route=path, status=str(status_code)
+            )
+            http_request_duration_seconds.observe(duration, method=method, route=path)
+            db_queries_per_request.observe(stats.queries, method=method, route=path)
+            db_time_per_request_seconds.observe(
+                stats.db_time, method=method, route=path
+            )
+            if stats.queries and check_request_queries(
+                method, path, scope.get("endpoint"), stats.statements
+            ):
+                db_query_budget_exceeded_total.inc(method=method, route=path)
@@ -0,0 +1,63 @@
+import time
+from http.cookies import SimpleCookie
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import READ_YOUR_WRITES_SECONDS
+
+# Методы, которые не меняют данные
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Cookie с моментом (unix time), до которого клиент читает из основной базы
+PRIMARY_PIN_COOKIE = "primary_until"
+
+
+def is_pinned_to_primary(connection: HTTPConnection) -> bool:
+    """
+    Проверяет, что клиент недавно выполнял запись и должен читать
+    из основной базы, чтобы увидеть свои изменения.
+    """
+    value = connection.cookies.get(PRIMARY_PIN_COOKIE)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """
+    После успешного изменяющего запроса выставляет клиенту cookie, по которой
+    get_async_read_db в течение READ_YOUR_WRITES_SECONDS выбирает основную
+    базу вместо реплики (реплика может отставать от основной).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or READ_YOUR_WRITES_SECONDS <= 0
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                pin_until = time.time() + READ_YOUR_WRITES_SECONDS
+                cookie[PRIMARY_PIN_COOKIE] = str(pin_until)
+                cookie[PRIMARY_PIN_COOKIE]["max-age"] = READ_YOUR_WRITES_SECONDS
+                cookie[PRIMARY_PIN_COOKIE]["path"] = "/"
+                cookie[PRIMARY_PIN_COOKIE]["httponly"] = True
+                cookie[PRIMARY_PIN_COOKIE]["samesite"] = "lax"
+                headers = MutableHeaders(scope=message)
+                headers.append("set-cookie", cookie.output(header="").strip())
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
@@ -0,0 +1,74 @@
+"""review user product unique
+
+Revision ID: 1159e40d2307
+Revises: d31c9d5210a4
+Create Date: 2025-11-21 10:44:13.902517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1159e40d2307'
+down_revision: Union[str, Sequence[str], None] = 'd31c9d5210a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+GRADES = range(1, 6)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # дубликаты, появившиеся из-за гонок проверки и вставки: остается
+    # активный отзыв (при равенстве - более ранний)
+    op.execute(
+        """
+        DELETE FROM reviews
+        USING (
+            SELECT id,
+                   row_number() OVER (
+                       PARTITION BY user_id, product_id
+                       ORDER BY is_active DESC, id
+                   ) AS position
+            FROM reviews
+        ) AS ranked
+        WHERE reviews.id = ranked.id AND ranked.position > 1
+        """
+    )
+    # счетчики рейтинга пересчитываются для товаров, где они разошлись
+    op.execute(
+        f"""
+        UPDATE products
+        SET rating_sum = stats.grade_sum,
+            rating_count = stats.grade_count,
+            rating = CASE WHEN stats.grade_count > 0
+                          THEN stats.grade_sum::float / stats.grade_count
+                          ELSE 0 END,
+            {', '.join(f'grade_{grade}_count = stats.grade_{grade}' for grade in GRADES)}
+        FROM (
+            SELECT products.id AS product_id,
+                   coalesce(sum(reviews.grade), 0) AS grade_sum,
+                   count(reviews.id) AS grade_count,
+                   {', '.join(f'count(*) FILTER (WHERE reviews.grade = {grade}) AS grade_{grade}' for grade in GRADES)}
+            FROM products
+            LEFT JOIN reviews
+                ON reviews.product_id = products.id AND reviews.is_active
+            GROUP BY products.id
+        ) AS stats
+        WHERE products.id = stats.product_id
+          AND (products.rating_sum, products.rating_count,
+               {', '.join(f'products.grade_{grade}_count' for grade in GRADES)})
+              IS DISTINCT FROM (stats.grade_sum, stats.grade_count,
+               {', '.join(f'stats.grade_{grade}' for grade in GRADES)})
+        """
+    )
+    op.create_unique_constraint(
+        'uq_reviews_user_id_product_id', 'reviews', ['user_id', 'product_id']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_reviews_user_id_product_id', 'reviews', type_='unique')
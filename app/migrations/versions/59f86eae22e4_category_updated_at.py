@@ -0,0 +1,36 @@
+"""category updated_at
+
+Revision ID: 59f86eae22e4
+Revises: 7c6a2e91f0d4
+Create Date: 2025-11-17 11:26:04.318562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '59f86eae22e4'
+down_revision: Union[str, Sequence[str], None] = '7c6a2e91f0d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'categories',
+        sa.Column(
+            'updated_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('categories', 'updated_at')
@@ -0,0 +1,43 @@
+"""product updated_at
+
+Revision ID: 7c6a2e91f0d4
+Revises: e5c19a7d3b48
+Create Date: 2025-11-14 09:53:20.661845
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c6a2e91f0d4'
+down_revision: Union[str, Sequence[str], None] = 'e5c19a7d3b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'products',
+        sa.Column(
+            'updated_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        'ix_products_updated_at_id',
+        'products',
+        ['updated_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_updated_at_id', table_name='products')
+    op.drop_column('products', 'updated_at')
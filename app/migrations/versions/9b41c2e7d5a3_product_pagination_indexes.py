@@ -0,0 +1,46 @@
+"""product pagination indexes
+
+Revision ID: 9b41c2e7d5a3
+Revises: 6208f15b6853
+Create Date: 2025-11-03 12:14:37.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b41c2e7d5a3'
+down_revision: Union[str, Sequence[str], None] = '6208f15b6853'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя индекса, колонки) - все индексы частичные, только по активным товарам
+INDEXES = [
+    ('ix_products_active_id', ['id']),
+    ('ix_products_active_price_id', ['price', 'id']),
+    ('ix_products_active_rating_id', ['rating', 'id']),
+    ('ix_products_active_category_id_id', ['category_id', 'id']),
+    ('ix_products_active_category_id_price_id', ['category_id', 'price', 'id']),
+    ('ix_products_active_category_id_rating_id', ['category_id', 'rating', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, columns in INDEXES:
+        op.create_index(
+            name,
+            'products',
+            columns,
+            unique=False,
+            postgresql_where=sa.text('is_active'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='products')
@@ -0,0 +1,54 @@
+"""product rating counters
+
+Revision ID: a83d5c0f7b12
+Revises: 4f0e6b93a2c7
+Create Date: 2025-11-10 16:27:05.118422
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a83d5c0f7b12'
+down_revision: Union[str, Sequence[str], None] = '4f0e6b93a2c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'products',
+        sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'products',
+        sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.alter_column('products', 'rating', server_default='0')
+    # начальные значения счетчиков по активным отзывам
+    op.execute(
+        """
+        UPDATE products
+        SET rating_sum = stats.grade_sum,
+            rating_count = stats.grade_count,
+            rating = stats.grade_sum::float / stats.grade_count
+        FROM (
+            SELECT product_id, sum(grade) AS grade_sum, count(*) AS grade_count
+            FROM reviews
+            WHERE is_active
+            GROUP BY product_id
+        ) AS stats
+        WHERE products.id = stats.product_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('products', 'rating', server_default=None)
+    op.drop_column('products', 'rating_count')
+    op.drop_column('products', 'rating_sum')
@@ -0,0 +1,32 @@
+"""category updated_at index
+
+Revision ID: b6e3d8f2a915
+Revises: 1159e40d2307
+Create Date: 2026-10-18 12:05:41.273390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e3d8f2a915'
+down_revision: Union[str, Sequence[str], None] = '1159e40d2307'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_categories_updated_at',
+        'categories',
+        ['updated_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_categories_updated_at', table_name='categories')
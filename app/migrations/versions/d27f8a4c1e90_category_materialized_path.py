@@ -0,0 +1,56 @@
+"""category materialized path
+
+Revision ID: d27f8a4c1e90
+Revises: 9b41c2e7d5a3
+Create Date: 2025-11-05 18:02:11.348120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd27f8a4c1e90'
+down_revision: Union[str, Sequence[str], None] = '9b41c2e7d5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'categories',
+        sa.Column(
+            'path',
+            sa.String(collation='C'),
+            server_default='',
+            nullable=False,
+        ),
+    )
+    # заполняем пути существующих категорий обходом дерева от корней
+    op.execute(
+        """
+        WITH RECURSIVE tree AS (
+            SELECT id, '/' || id || '/' AS path
+            FROM categories
+            WHERE parent_id IS NULL
+            UNION ALL
+            SELECT c.id, tree.path || c.id || '/'
+            FROM categories AS c
+            JOIN tree ON c.parent_id = tree.id
+        )
+        UPDATE categories
+        SET path = tree.path
+        FROM tree
+        WHERE categories.id = tree.id
+        """
+    )
+    op.create_index('ix_categories_path', 'categories', ['path'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_categories_path', table_name='categories')
+    op.drop_column('categories', 'path')
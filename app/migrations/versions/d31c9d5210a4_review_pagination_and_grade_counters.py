@@ -0,0 +1,72 @@
+"""review pagination and grade counters
+
+Revision ID: d31c9d5210a4
+Revises: 59f86eae22e4
+Create Date: 2025-11-19 15:02:47.530196
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd31c9d5210a4'
+down_revision: Union[str, Sequence[str], None] = '59f86eae22e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+GRADES = range(1, 6)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for grade in GRADES:
+        op.add_column(
+            'products',
+            sa.Column(
+                f'grade_{grade}_count',
+                sa.Integer(),
+                server_default='0',
+                nullable=False,
+            ),
+        )
+    # начальное распределение оценок по активным отзывам
+    op.execute(
+        f"""
+        UPDATE products
+        SET {', '.join(f'grade_{grade}_count = stats.grade_{grade}' for grade in GRADES)}
+        FROM (
+            SELECT product_id,
+                   {', '.join(f'count(*) FILTER (WHERE grade = {grade}) AS grade_{grade}' for grade in GRADES)}
+            FROM reviews
+            WHERE is_active
+            GROUP BY product_id
+        ) AS stats
+        WHERE products.id = stats.product_id
+        """
+    )
+    op.create_index(
+        'ix_reviews_product_id_is_active_comment_date_id',
+        'reviews',
+        ['product_id', 'is_active', 'comment_date', 'id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_reviews_active_comment_date_id',
+        'reviews',
+        ['comment_date', 'id'],
+        unique=False,
+        postgresql_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reviews_active_comment_date_id', table_name='reviews')
+    op.drop_index(
+        'ix_reviews_product_id_is_active_comment_date_id', table_name='reviews'
+    )
+    for grade in reversed(GRADES):
+        op.drop_column('products', f'grade_{grade}_count')
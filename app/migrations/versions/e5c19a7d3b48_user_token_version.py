@@ -0,0 +1,31 @@
+"""user token version
+
+Revision ID: e5c19a7d3b48
+Revises: a83d5c0f7b12
+Create Date: 2025-11-12 11:06:43.275981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c19a7d3b48'
+down_revision: Union[str, Sequence[str], None] = 'a83d5c0f7b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'users',
+        sa.Column('token_version', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
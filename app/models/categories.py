@@ -1,5 +1,14 @@
 from typing import TYPE_CHECKING
-from sqlalchemy import String, ForeignKey
+from datetime import datetime
+from sqlalchemy import (
+    String,
+    ForeignKey,
+    Index,
+    DateTime,
+    and_,
+    func,
+    ColumnElement,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -17,6 +26,19 @@ class Category(Base):
         ForeignKey("categories.id"), nullable=True
     )
     is_active: Mapped[bool] = mapped_column(default=True)
+    # Время последнего изменения (для ETag): обновляется любым UPDATE
+    # через SQLAlchemy, в том числе массовым
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+    # Материализованный путь от корня: "/1/5/12/" (включая собственный id).
+    # Collation "C" дает побайтовое сравнение, поэтому поддерево - это
+    # диапазон по индексу, см. in_subtree()
+    path: Mapped[str] = mapped_column(
+        String(collation="C"), nullable=False, server_default=""
+    )
 
     products: Mapped[list["Product"]] = relationship(
         "Product", back_populates="category"
@@ -32,3 +54,29 @@ class Category(Base):
         "Category",
         back_populates="parent",
     )
+
+    __table_args__ = (
+        Index("ix_categories_path", "path"),
+        # Инкрементальная выгрузка каталога: товары измененных категорий
+        Index("ix_categories_updated_at", "updated_at"),
+    )
+
+    @staticmethod
+    def child_path(parent_path: str | None, category_id: int) -> str:
+        """
+        Строит путь категории по пути родителя (None - корневая категория).
+        """
+        return f"{parent_path or '/'}{category_id}/"
+
+    @classmethod
+    def in_subtree(cls, path: str | ColumnElement[str]) -> ColumnElement[bool]:
+        """
+        Условие "категория лежит в поддереве с путем path" (включая корень).
+        Путь заканчивается на "/", а следующий за ним символ - "0", поэтому
+        все потомки попадают в полуинтервал [path, path без "/" + "0").
+        """
+        if isinstance(path, str):
+            upper = path[:-1] + "0"
+        else:
+            upper = func.substr(path, 1, func.length(path) - 1).concat("0")
+        return and_(cls.path >= path, cls.path < upper)
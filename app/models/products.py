@@ -1,6 +1,19 @@
 from typing import TYPE_CHECKING
+from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import String, Integer, Numeric, ForeignKey, Float
+from sqlalchemy import (
+    String,
+    Integer,
+    Numeric,
+    ForeignKey,
+    Float,
+    Index,
+    Computed,
+    DateTime,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -10,6 +23,9 @@ if TYPE_CHECKING:
     from app.models.users import User
     from app.models.reviews import Review
 
+# Конфигурация полнотекстового поиска; должна совпадать в колонке и в запросах
+SEARCH_CONFIG = "russian"
+
 
 class Product(Base):
     __tablename__ = "products"
@@ -22,9 +38,38 @@ class Product(Base):
     )
     image_url: Mapped[str | None] = mapped_column(String(200), nullable=True)
     stock: Mapped[int] = mapped_column(Integer, nullable=False)
-    rating: Mapped[float] = mapped_column(Float, default=0.0)
+    rating: Mapped[float] = mapped_column(Float, default=0.0, server_default="0")
+    # Сумма и количество оценок активных отзывов: рейтинг пересчитывается
+    # за O(1) при каждом изменении отзыва, см. app.utils.rating_change
+    rating_sum: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    rating_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0"
+    )
+    # Распределение оценок активных отзывов (для сводки по отзывам),
+    # обновляется вместе с rating_sum и rating_count
+    grade_1_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    grade_2_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    grade_3_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    grade_4_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    grade_5_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     is_active: Mapped[bool] = mapped_column(default=True)
+    # Время последнего изменения: обновляется любым UPDATE через SQLAlchemy
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
     seller_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # Поисковый вектор вычисляет сама база; при обычной загрузке товара не читается
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"to_tsvector('{SEARCH_CONFIG}', "
+            "coalesce(name, '') || ' ' || coalesce(description, ''))",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
     category_id: Mapped[int] = mapped_column(
         ForeignKey(column="categories.id", ondelete="CASCADE"), nullable=False
@@ -33,3 +78,57 @@ class Product(Base):
     category: Mapped["Category"] = relationship("Category", back_populates="products")
     seller: Mapped["User"] = relationship("User", back_populates="products")
     reviews: Mapped[list["Review"]] = relationship("Review", back_populates="product")
+
+    # Частичные индексы для keyset-пагинации по активным товарам:
+    # каждая страница читается диапазоном индекса без сортировки
+    __table_args__ = (
+        Index("ix_products_active_id", "id", postgresql_where=text("is_active")),
+        Index(
+            "ix_products_active_price_id",
+            "price",
+            "id",
+            postgresql_where=text("is_active"),
+        ),
+        Index(
+            "ix_products_active_rating_id",
+            "rating",
+            "id",
+            postgresql_where=text("is_active"),
+        ),
+        Index(
+            "ix_products_active_category_id_id",
+            "category_id",
+            "id",
+            postgresql_where=text("is_active"),
+        ),
+        Index(
+            "ix_products_active_category_id_price_id",
+            "category_id",
+            "price",
+            "id",
+            postgresql_where=text("is_active"),
+        ),
+        Index(
+            "ix_products_active_category_id_rating_id",
+            "category_id",
+            "rating",
+            "id",
+            postgresql_where=text("is_active"),
+        ),
+        # Инкрементальная выгрузка каталога (updated_since)
+        Index("ix_products_updated_at_id", "updated_at", "id"),
+        # Полнотекстовый поиск и нечеткий поиск по названию (pg_trgm)
+        Index(
+            "ix_products_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+            postgresql_where=text("is_active"),
+        ),
+        Index(
+            "ix_products_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=text("is_active"),
+        ),
+    )
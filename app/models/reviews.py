@@ -9,6 +9,9 @@ from sqlalchemy import (
     Integer,
     Text,
     CheckConstraint,
+    Index,
+    UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
@@ -56,4 +59,23 @@ class Review(Base):
 
     __table_args__ = (
         CheckConstraint("grade >= 1 AND grade <= 5", name="grade_check"),
+        # Один отзыв пользователя на товар; на это ограничение опирается
+        # INSERT ... ON CONFLICT DO NOTHING в app.utils.insert_review
+        UniqueConstraint(
+            "user_id", "product_id", name="uq_reviews_user_id_product_id"
+        ),
+        # Курсорная пагинация отзывов товара и всех отзывов по дате
+        Index(
+            "ix_reviews_product_id_is_active_comment_date_id",
+            "product_id",
+            "is_active",
+            "comment_date",
+            "id",
+        ),
+        Index(
+            "ix_reviews_active_comment_date_id",
+            "comment_date",
+            "id",
+            postgresql_where=text("is_active"),
+        ),
     )
\ No newline at end of file
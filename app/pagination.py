@@ -0,0 +1,137 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, Select, tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+
+
+@dataclass(frozen=True)
+class SortOrder:
+    """
+    Описание порядка сортировки для курсорной пагинации.
+    Сортировка всегда ведется по паре (key, id), чтобы порядок был однозначным.
+    Ключом может быть и вычисляемое выражение (например, ранг поиска).
+    """
+
+    key: InstrumentedAttribute | ColumnElement
+    id: InstrumentedAttribute
+    descending: bool = False
+    # преобразование значения ключа из курсора обратно в тип колонки
+    parse: Callable[[Any], Any] = lambda value: value
+
+
+def encode_cursor(sort: str, key_value: Any, id_value: int) -> str:
+    """
+    Кодирует позицию последней строки страницы в непрозрачную строку.
+    """
+    if isinstance(key_value, Decimal):
+        key_value = str(key_value)
+    elif isinstance(key_value, datetime):
+        key_value = key_value.isoformat()
+    raw = json.dumps([sort, key_value, id_value], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+invalid_cursor = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid cursor",
+)
+
+# Допустимые значения первичных ключей (колонки Integer)
+MAX_ID = 2**31 - 1
+
+
+def parse_id(value: Any) -> int:
+    """
+    Проверяет id из курсора: целое число в пределах колонки Integer.
+    Иначе asyncpg отклонил бы параметр и запрос завершился бы ошибкой 500.
+    """
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError("Cursor id must be an integer")
+    if not 1 <= value <= MAX_ID:
+        raise ValueError("Cursor id is out of range")
+    return value
+
+
+def _load_cursor(cursor: str) -> tuple[str, Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key_value, id_value = json.loads(raw)
+        id_value = parse_id(id_value)
+    except (binascii.Error, ValueError, TypeError):
+        raise invalid_cursor
+    if not isinstance(cursor_sort, str):
+        raise invalid_cursor
+    return cursor_sort, key_value, id_value
+
+
+def cursor_sort(cursor: str) -> str:
+    """
+    Возвращает сортировку, для которой был выдан курсор.
+    """
+    return _load_cursor(cursor)[0]
+
+
+def decode_cursor(cursor: str, sort: str, order: SortOrder) -> tuple[Any, int]:
+    """
+    Раскодирует курсор и проверяет, что он выдан для той же сортировки.
+    """
+    cursor_sort, key_value, id_value = _load_cursor(cursor)
+    if cursor_sort != sort:
+        raise invalid_cursor
+    try:
+        return order.parse(key_value), id_value
+    except (ValueError, TypeError, ArithmeticError):
+        raise invalid_cursor
+
+
+def paginate(
+    stmt: Select, sort: str, order: SortOrder, cursor: str | None, limit: int
+) -> Select:
+    """
+    Добавляет к запросу условие keyset-пагинации, сортировку и лимит.
+    Запрашивается на одну строку больше, чтобы понять, есть ли следующая страница.
+    """
+    if order.descending:
+        stmt = stmt.order_by(order.key.desc(), order.id.desc())
+    else:
+        stmt = stmt.order_by(order.key.asc(), order.id.asc())
+
+    if cursor is not None:
+        key_value, id_value = decode_cursor(cursor, sort, order)
+        position = tuple_(order.key, order.id)
+        if order.descending:
+            stmt = stmt.where(position < tuple_(key_value, id_value))
+        else:
+            stmt = stmt.where(position > tuple_(key_value, id_value))
+
+    return stmt.limit(limit + 1)
+
+
+def next_cursor(
+    rows: list,
+    sort: str,
+    order: SortOrder,
+    limit: int,
+    position: Callable[[Any], tuple[Any, int]] | None = None,
+) -> str | None:
+    """
+    Отрезает лишнюю строку и возвращает курсор следующей страницы
+    (или None, если страница последняя).
+    position извлекает (ключ, id) из строки, если ключ не атрибут модели.
+    """
+    if len(rows) <= limit:
+        return None
+    del rows[limit:]
+    last = rows[-1]
+    if position is None:
+        return encode_cursor(
+            sort, getattr(last, order.key.key), getattr(last, order.id.key)
+        )
+    return encode_cursor(sort, *position(last))
@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy import Row, Select, func, select, union_all
+
+from app.config import EXPORT_CHUNK_SIZE, EXPORT_WATERMARK_MARGIN
+from app.database import next_read_session_maker
+from app.models.categories import Category as CategoryModel
+from app.models.products import Product as ProductModel
+
+# Товар виден в каталоге, только если активна и его категория (как в /products/)
+IS_VISIBLE = (ProductModel.is_active & CategoryModel.is_active).label("is_active")
+# Деактивация категории не меняет products.updated_at, поэтому время изменения
+# товара в выгрузке - позднее из времени товара и его категории
+UPDATED_AT = func.greatest(ProductModel.updated_at, CategoryModel.updated_at).label(
+    "updated_at"
+)
+
+# Колонки выгрузки; выбираются как обычные строки, без создания ORM-объектов
+EXPORT_COLUMNS = (
+    ProductModel.id,
+    ProductModel.name,
+    ProductModel.description,
+    ProductModel.price,
+    ProductModel.image_url,
+    ProductModel.stock,
+    ProductModel.rating,
+    IS_VISIBLE,
+    ProductModel.category_id,
+    UPDATED_AT,
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+def export_watermark() -> datetime:
+    """
+    Момент, с которого клиент должен продолжить синхронизацию (updated_since
+    следующей выгрузки). Берется до начала транзакции выгрузки с запасом
+    EXPORT_WATERMARK_MARGIN: updated_at заполняется now(), временем начала
+    пишущей транзакции, поэтому строка, закоммиченная уже после выгрузки,
+    может иметь updated_at меньше максимального в ней.
+    """
+    return datetime.now(timezone.utc) - timedelta(seconds=EXPORT_WATERMARK_MARGIN)
+
+
+def _export_query(updated_since: datetime | None) -> Select:
+    """
+    Запрос выгрузки, который читается по индексам без сортировки всего каталога.
+    Полная выгрузка идет в порядке первичного ключа. Инкрементальная -
+    объединение двух веток: товары, измененные сами (ix_products_updated_at_id),
+    и активные товары измененных категорий (ix_categories_updated_at
+    + ix_products_active_category_id_id); товары, попавшие в первую ветку,
+    из второй исключены. Порядок строк инкрементальной выгрузки не определен.
+    """
+    stmt = select(*EXPORT_COLUMNS).join(
+        CategoryModel, ProductModel.category_id == CategoryModel.id
+    )
+    if updated_since is None:
+        return stmt.where(
+            ProductModel.is_active == True, CategoryModel.is_active == True
+        ).order_by(ProductModel.id)
+    # неактивные товары изменившейся категории уже выгружались как
+    # is_active=false и остаются такими при любом состоянии категории
+    return union_all(
+        stmt.where(ProductModel.updated_at >= updated_since),
+        stmt.where(
+            CategoryModel.updated_at >= updated_since,
+            ProductModel.is_active == True,
+            ProductModel.updated_at < updated_since,
+        ),
+    )
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _ndjson_chunk(rows: Sequence[Row]) -> str:
+    return "".join(
+        json.dumps(row._asdict(), default=_json_default, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _csv_chunk(rows: Sequence[Row]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+async def stream_products(
+    export_format: str, updated_since: datetime | None
+) -> AsyncIterator[str]:
+    """
+    Выгружает товары чанками по EXPORT_CHUNK_SIZE строк через серверный курсор,
+    так что память процесса не зависит от размера каталога.
+    Без updated_since выгружаются только видимые товары (активные, в активной
+    категории), с ним - все товары, измененные с этого момента сами или через
+    свою категорию; удаленные и скрытые деактивацией категории идут
+    с is_active=false. Продолжать синхронизацию нужно с export_watermark(),
+    а не с максимального updated_at в выгрузке.
+    Сессия открывается здесь, а не берется из зависимости: генератор работает
+    уже после выхода из обработчика.
+    """
+    stmt = _export_query(updated_since)
+
+    serialize = _csv_chunk if export_format == "csv" else _ndjson_chunk
+    if export_format == "csv":
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+
+    async with next_read_session_maker()() as session:
+        result = await session.stream(
+            stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            yield serialize(rows)
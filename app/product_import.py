@@ -0,0 +1,265 @@
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator
+from decimal import Decimal
+from typing import Any
+
+import asyncpg
+from pydantic import ValidationError
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    insert,
+    literal,
+    select,
+    true,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateTable
+
+from app.config import IMPORT_BATCH_SIZE, IMPORT_MAX_ERRORS
+from app.models.categories import Category as CategoryModel
+from app.models.products import Product as ProductModel
+from app.schemas import ProductCreate, ProductImportError, ProductImportReport
+
+# Временная таблица для COPY. Строки удаляются при каждом коммите, поэтому
+# таблица переиспользуется всеми пакетами на соединении.
+# Отдельный MetaData - чтобы таблица не попала в миграции.
+staging_table = Table(
+    "product_import_staging",
+    MetaData(),
+    Column("line", Integer),
+    Column("name", String(100)),
+    Column("description", String(500)),
+    Column("price", Numeric(10, 2)),
+    Column("image_url", String(200)),
+    Column("stock", Integer),
+    Column("category_id", Integer),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DELETE ROWS",
+)
+
+STAGING_COLUMNS = [column.name for column in staging_table.columns]
+PRODUCT_COLUMNS = STAGING_COLUMNS[1:]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Разбивает поток байтов на строки, не загружая весь файл в память.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line.removesuffix("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.removesuffix("\r")
+
+
+async def iter_ndjson_rows(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, dict[str, Any] | str]]:
+    """
+    Возвращает пары (номер строки, объект или текст ошибки) из NDJSON.
+    """
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, "Expected a JSON object"
+            continue
+        yield line_number, row
+
+
+async def iter_csv_rows(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, dict[str, Any] | str]]:
+    """
+    Возвращает пары (номер строки, словарь полей или текст ошибки) из CSV
+    с заголовком. Поля в кавычках могут содержать переводы строк.
+    """
+    header: list[str] | None = None
+    record = ""
+    line_number = record_start = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not record:
+            record_start = line_number
+            record = line
+        else:
+            record += "\n" + line
+        # нечетное число кавычек - поле продолжается на следующей строке
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as exc:
+            yield record_start, f"Invalid CSV: {exc}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield record_start, (
+                f"Expected {len(header)} columns, got {len(values)}"
+            )
+            continue
+        # пустые ячейки означают "не задано", а не пустую строку
+        yield record_start, {
+            name: value for name, value in zip(header, values) if value != ""
+        }
+    if record:
+        yield record_start, "Invalid CSV: unterminated quoted field"
+
+
+class ProductImporter:
+    """
+    Загружает товары пакетами: каждая строка валидируется по ProductCreate,
+    категории пакета проверяются одним запросом, а строки пакета копируются
+    через COPY во временную таблицу и переносятся в products одним INSERT.
+    Память ограничена размером пакета и лимитом сохраняемых ошибок.
+    """
+
+    def __init__(self, db: AsyncSession, seller_id: int):
+        self.db = db
+        self.seller_id = seller_id
+        self.batch: list[tuple[int, ProductCreate]] = []
+        self.known_categories: dict[int, bool] = {}
+        self.touched_categories: set[int] = set()
+        self.total_rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: list[ProductImportError] = []
+
+    def add_error(self, line: int, errors: list[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(ProductImportError(line=line, errors=errors))
+
+    async def add(self, line: int, row: dict[str, Any] | str) -> None:
+        self.total_rows += 1
+        if isinstance(row, str):
+            self.add_error(line, [row])
+            return
+        try:
+            product = ProductCreate.model_validate(row)
+        except ValidationError as exc:
+            self.add_error(
+                line,
+                [
+                    f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                    for error in exc.errors()
+                ],
+            )
+            return
+        self.batch.append((line, product))
+        if len(self.batch) >= IMPORT_BATCH_SIZE:
+            await self.flush()
+
+    async def _check_categories(self) -> None:
+        """
+        Одним запросом узнает, какие из новых категорий пакета активны.
+        """
+        unknown = {
+            product.category_id
+            for _, product in self.batch
+            if product.category_id not in self.known_categories
+        }
+        if not unknown:
+            return
+        result = await self.db.scalars(
+            select(CategoryModel.id).where(
+                CategoryModel.id.in_(unknown),
+                CategoryModel.is_active == True,
+            )
+        )
+        active = set(result.all())
+        for category_id in unknown:
+            self.known_categories[category_id] = category_id in active
+
+    async def flush(self) -> None:
+        if not self.batch:
+            return
+        await self._check_categories()
+
+        records = []
+        for line, product in self.batch:
+            if not self.known_categories[product.category_id]:
+                self.add_error(line, ["category_id: Category not found"])
+                continue
+            records.append(
+                (
+                    line,
+                    product.name,
+                    product.description,
+                    Decimal(str(product.price)),
+                    product.image_url,
+                    product.stock,
+                    product.category_id,
+                )
+            )
+        self.batch.clear()
+        if not records:
+            return
+
+        try:
+            await self._copy_batch(records)
+        except (DBAPIError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+            # значение, прошедшее ProductCreate, но отвергнутое базой:
+            # пакет откатывается целиком, его строки попадают в отчет
+            await self.db.rollback()
+            message = f"Batch rejected by database: {getattr(exc, 'orig', exc)}"
+            for record in records:
+                self.add_error(record[0], [message])
+            return
+        self.imported += len(records)
+        self.touched_categories.update(record[-1] for record in records)
+
+    async def _copy_batch(self, records: list[tuple]) -> None:
+        await self.db.execute(CreateTable(staging_table, if_not_exists=True))
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            staging_table.name, records=records, columns=STAGING_COLUMNS
+        )
+        await self.db.execute(
+            insert(ProductModel).from_select(
+                [*PRODUCT_COLUMNS, "seller_id", "is_active"],
+                select(
+                    *(staging_table.c[name] for name in PRODUCT_COLUMNS),
+                    literal(self.seller_id),
+                    true(),
+                ).order_by(staging_table.c.line),
+            )
+        )
+        # коммит после каждого пакета: временная таблица очищается,
+        # а уже загруженные пакеты не теряются при ошибке в следующих
+        await self.db.commit()
+
+    def report(self) -> ProductImportReport:
+        return ProductImportReport(
+            total_rows=self.total_rows,
+            imported=self.imported,
+            failed=self.failed,
+            errors=self.errors,
+            errors_truncated=self.failed > len(self.errors),
+        )
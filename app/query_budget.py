@@ -0,0 +1,141 @@
+import logging
+import re
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger("app.query_budget")
+
+EndpointT = TypeVar("EndpointT", bound=Callable[..., Any])
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def query_budget(
+    max_queries: int | None, *, allow_repeats: bool = False
+) -> Callable[[EndpointT], EndpointT]:
+    """
+    Объявляет для обработчика максимальное число SQL-запросов на HTTP-запрос.
+    Превышение логируется (и считается в метриках) при каждом запросе.
+    allow_repeats отключает предупреждения о повторах - для обработчиков,
+    которые намеренно выполняют один и тот же запрос пакетами.
+    Декоратор ставится под декоратором маршрута:
+
+        @router.get("/{product_id}")
+        @query_budget(2)
+        async def get_product(...): ...
+    """
+
+    def decorator(endpoint: EndpointT) -> EndpointT:
+        endpoint.__query_budget__ = max_queries
+        endpoint.__query_repeats_allowed__ = allow_repeats
+        return endpoint
+
+    return decorator
+
+
+def get_query_budget(endpoint: Callable[..., Any] | None) -> tuple[int | None, bool]:
+    """
+    Возвращает (бюджет, разрешены ли повторы) обработчика.
+    """
+    return (
+        getattr(endpoint, "__query_budget__", None),
+        getattr(endpoint, "__query_repeats_allowed__", False),
+    )
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Приводит SQL к виду, в котором почти одинаковые запросы совпадают:
+    параметры и списки параметров (IN (...)) заменяются на "?".
+    """
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("?", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def repeated_statements(statements: Counter[str]) -> dict[str, int]:
+    """
+    Возвращает нормализованные запросы, выполненные больше одного раза
+    (типичный признак N+1).
+    """
+    normalized: Counter[str] = Counter()
+    for statement, count in statements.items():
+        normalized[normalize_statement(statement)] += count
+    return {statement: count for statement, count in normalized.items() if count > 1}
+
+
+def check_request_queries(
+    method: str, route: str, endpoint: Callable[..., Any] | None, statements: Counter[str]
+) -> bool:
+    """
+    Логирует повторяющиеся запросы и превышение бюджета обработчика.
+    Возвращает True, если бюджет превышен.
+    """
+    budget, allow_repeats = get_query_budget(endpoint)
+    if not allow_repeats:
+        for statement, count in repeated_statements(statements).items():
+            logger.warning(
+                "%s %s: statement executed %d times (possible N+1): %s",
+                method,
+                route,
+                count,
+                statement,
+            )
+
+    total = sum(statements.values())
+    if budget is not None and total > budget:
+        logger.warning(
+            "%s %s: %d queries exceed the budget of %d", method, route, total, budget
+        )
+        return True
+    return False
+
+
+@contextmanager
+def assert_max_queries(
+    max_queries: int, engines: Iterable[AsyncEngine | Engine] | None = None
+) -> Iterator[list[str]]:
+    """
+    Проверка для тестов: код внутри блока выполнил не больше max_queries
+    SQL-запросов. Слушатели вешаются на движки (по умолчанию - основной
+    и все реплики), поэтому учитываются запросы из любого потока и event loop
+    (в том числе из TestClient):
+
+        with assert_max_queries(2):
+            client.get("/products/1")
+    """
+    if engines is None:
+        from app.database import async_engine, read_engines
+
+        engines = (async_engine, *read_engines)
+    sync_engines = [getattr(engine, "sync_engine", engine) for engine in engines]
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for sync_engine in sync_engines:
+        event.listen(sync_engine, "after_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for sync_engine in sync_engines:
+            event.remove(sync_engine, "after_cursor_execute", record)
+
+    if len(statements) > max_queries:
+        executed = "\n".join(
+            f"{number}. {normalize_statement(statement)}"
+            for number, statement in enumerate(statements, start=1)
+        )
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, got {len(statements)}:\n"
+            f"{executed}"
+        )
@@ -0,0 +1,21 @@
+"""
+Сверка рейтингов товаров с активными отзывами.
+
+Запуск: python -m app.reconcile_ratings
+"""
+
+import asyncio
+
+from app.database import async_session_maker
+from app.utils import reconcile_product_ratings
+
+
+async def main() -> None:
+    async with async_session_maker() as session:
+        fixed = await reconcile_product_ratings(session)
+        await session.commit()
+    print(f"Рейтинги сверены, исправлено товаров: {fixed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
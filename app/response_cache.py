@@ -0,0 +1,356 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Protocol, TypeVar
+from urllib.parse import parse_qsl, urlencode
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.background import background
+from app.config import (
+    REPLICA_MAX_LAG_SECONDS,
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_MAX_AGE,
+    RESPONSE_CACHE_REDIS_URL,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+)
+from app.etag import etag_matches
+from app.middleware import PRIMARY_PIN_COOKIE
+
+logger = logging.getLogger("app.response_cache")
+
+EndpointT = TypeVar("EndpointT", bound=Callable[..., Any])
+
+# Заголовки ответа, которые сохраняются вместе с телом
+STORED_HEADERS = frozenset({b"content-type", b"etag", b"cache-control"})
+
+
+def cached_response(*tags: str) -> Callable[[EndpointT], EndpointT]:
+    """
+    Разрешает ResponseCacheMiddleware кэшировать ответы обработчика
+    для анонимных GET-запросов. Теги - шаблоны с параметрами пути
+    ("product:{product_id}"); запись сбрасывает ответы по тегам через
+    schedule_response_invalidation(). Декоратор ставится под декоратором маршрута.
+    """
+
+    def decorator(endpoint: EndpointT) -> EndpointT:
+        endpoint.__response_cache_tags__ = tags
+        return endpoint
+
+    return decorator
+
+
+def pack(status: int, headers: list[tuple[bytes, bytes]], route: str, body: bytes) -> bytes:
+    """
+    Упаковывает ответ в одну строку байтов: JSON-заголовок, перевод строки, тело.
+    """
+    meta = orjson.dumps(
+        {
+            "status": status,
+            "headers": [[name.decode(), value.decode()] for name, value in headers],
+            "route": route,
+        }
+    )
+    return meta + b"\n" + body
+
+
+def unpack(value: bytes) -> tuple[int, list[tuple[bytes, bytes]], str, bytes]:
+    meta, body = value.split(b"\n", 1)
+    meta = orjson.loads(meta)
+    headers = [(name.encode(), value.encode()) for name, value in meta["headers"]]
+    return meta["status"], headers, meta["route"], body
+
+
+class ResponseCacheBackend(Protocol):
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, tags: list[str], ttl: float) -> None: ...
+
+    async def invalidate(self, *tags: str) -> None: ...
+
+    async def clear(self) -> None: ...
+
+
+class MemoryBackend:
+    """
+    Кэш ответов в памяти процесса: LRU с TTL и индексом ключей по тегам.
+    При нескольких процессах у каждого свой кэш.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # ключ -> (момент устаревания, упакованный ответ, теги)
+        self.entries: OrderedDict[str, tuple[float, bytes, list[str]]] = OrderedDict()
+        self.tags: dict[str, set[str]] = {}
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, tags: list[str], ttl: float) -> None:
+        self._remove(key)
+        self.entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+        while len(self.entries) > self.maxsize:
+            self._remove(next(iter(self.entries)))
+
+    async def invalidate(self, *tags: str) -> None:
+        for tag in tags:
+            for key in list(self.tags.get(tag, ())):
+                self._remove(key)
+
+    async def clear(self) -> None:
+        self.entries.clear()
+        self.tags.clear()
+
+
+class RedisBackend:
+    """
+    Общий для всех процессов кэш ответов в Redis. Ключи тега хранятся
+    в множестве "<префикс>tag:<тег>". Ошибки Redis не ломают запрос:
+    кэш просто не используется.
+    """
+
+    prefix = "response:"
+
+    def __init__(self, url: str):
+        # redis - необязательная зависимость: pip install ".[redis]"
+        from redis import asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.errors = (redis.RedisError, OSError)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self.client.get(self.prefix + key)
+        except self.errors:
+            logger.warning("Redis is unavailable, response cache skipped", exc_info=True)
+            return None
+
+    async def set(self, key: str, value: bytes, tags: list[str], ttl: float) -> None:
+        seconds = max(1, math.ceil(ttl))
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.set(self.prefix + key, value, ex=seconds)
+                for tag in tags:
+                    pipe.sadd(self._tag_key(tag), self.prefix + key)
+                    pipe.expire(self._tag_key(tag), seconds)
+                await pipe.execute()
+        except self.errors:
+            logger.warning("Redis is unavailable, response not cached", exc_info=True)
+
+    async def invalidate(self, *tags: str) -> None:
+        try:
+            for tag in tags:
+                keys = await self.client.smembers(self._tag_key(tag))
+                await self.client.delete(self._tag_key(tag), *keys)
+        except self.errors:
+            logger.warning("Redis is unavailable, invalidation failed", exc_info=True)
+
+    async def clear(self) -> None:
+        try:
+            async for key in self.client.scan_iter(match=self.prefix + "*"):
+                await self.client.delete(key)
+        except self.errors:
+            logger.warning("Redis is unavailable, clear failed", exc_info=True)
+
+
+def create_backend(name: str) -> ResponseCacheBackend | None:
+    if name == "memory":
+        return MemoryBackend(RESPONSE_CACHE_SIZE)
+    if name == "redis":
+        return RedisBackend(RESPONSE_CACHE_REDIS_URL)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown response cache backend: {name}")
+
+
+response_cache = create_backend(RESPONSE_CACHE_BACKEND)
+
+response_cache_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "bypassed": 0,
+    "stale_stores": 0,
+}
+
+# Счетчик и момент последней инвалидации ответов в этом процессе: ответ,
+# сформированный во время инвалидации или с реплики вскоре после нее,
+# может содержать данные до записи и не сохраняется
+invalidation_state = {"generation": 0, "at": float("-inf")}
+
+
+def mark_responses_invalidated() -> None:
+    invalidation_state["generation"] += 1
+    invalidation_state["at"] = time.monotonic()
+
+
+async def invalidate_responses(*tags: str) -> None:
+    """
+    Сбрасывает закэшированные ответы с указанными тегами.
+    """
+    if response_cache is not None:
+        await response_cache.invalidate(*tags)
+
+
+def schedule_response_invalidation(*tags: str) -> None:
+    """
+    Сбрасывает ответы по тегам в фоне, вне пути запроса; повторные сбросы
+    одного тега до выполнения схлопываются. Вызывается после коммита
+    изменяющих запросов: сами писавшие клиенты идут мимо кэша (cookie
+    read-your-writes), остальные увидят изменения через BACKGROUND_FLUSH_DELAY.
+    """
+    if response_cache is None:
+        return
+    mark_responses_invalidated()
+    for tag in tags:
+        background.submit(("responses", tag), lambda tag=tag: invalidate_responses(tag))
+
+
+def cache_key(scope: Scope) -> str:
+    """
+    Ключ - путь и отсортированные параметры запроса,
+    так что "?a=1&b=2" и "?b=2&a=1" дают один ключ.
+    """
+    query = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    return scope["path"] + "?" + urlencode(sorted(query))
+
+
+def is_anonymous(headers: Headers) -> bool:
+    """
+    Кэшируются только запросы без авторизации; клиенты, недавно выполнявшие
+    запись (cookie read-your-writes), тоже идут мимо кэша.
+    """
+    return "authorization" not in headers and PRIMARY_PIN_COOKIE not in headers.get(
+        "cookie", ""
+    )
+
+
+class ResponseCacheMiddleware:
+    """
+    Кэширует ответы 200 обработчиков, помеченных @cached_response, для анонимных
+    GET-запросов и добавляет к ним Cache-Control. При попадании ответ отдается
+    без маршрутизации и обращения к базе (или 304, если совпал ETag).
+    """
+
+    def __init__(self, app: ASGIApp, backend: ResponseCacheBackend | None = None):
+        self.app = app
+        self.backend = backend if backend is not None else response_cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.backend is None or scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        anonymous = is_anonymous(request_headers)
+        key = cache_key(scope)
+        if anonymous:
+            cached = await self.backend.get(key)
+            if cached is not None:
+                response_cache_stats["hits"] += 1
+                await self.send_cached(scope, send, cached, request_headers)
+                return
+
+        generation = invalidation_state["generation"]
+        status_code = 200
+        tags: list[str] | None = None
+        stored_headers: list[tuple[bytes, bytes]] = []
+        body = bytearray()
+
+        async def send_and_store(message: Message) -> None:
+            nonlocal status_code, tags
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                tag_templates = getattr(
+                    scope.get("endpoint"), "__response_cache_tags__", None
+                )
+                if tag_templates is not None and status_code == 200:
+                    headers = MutableHeaders(scope=message)
+                    if anonymous:
+                        headers["cache-control"] = (
+                            f"public, max-age={RESPONSE_CACHE_MAX_AGE}"
+                        )
+                        headers["x-cache"] = "MISS"
+                        path_params = scope.get("path_params", {})
+                        tags = [template.format(**path_params) for template in tag_templates]
+                        stored_headers[:] = [
+                            (name, value)
+                            for name, value in message["headers"]
+                            if name in STORED_HEADERS
+                        ]
+                        response_cache_stats["misses"] += 1
+                    else:
+                        headers["cache-control"] = "private, no-cache"
+                        response_cache_stats["bypassed"] += 1
+            elif message["type"] == "http.response.body" and tags is not None:
+                body.extend(message.get("body", b""))
+                if not message.get("more_body", False):
+                    if self.is_stale(scope, generation):
+                        response_cache_stats["stale_stores"] += 1
+                        await send(message)
+                        return
+                    route = getattr(scope.get("route"), "path", "unmatched")
+                    await self.backend.set(
+                        key,
+                        pack(status_code, stored_headers, route, bytes(body)),
+                        tags,
+                        RESPONSE_CACHE_TTL,
+                    )
+                    response_cache_stats["stores"] += 1
+            await send(message)
+
+        await self.app(scope, receive, send_and_store)
+
+    def is_stale(self, scope: Scope, generation: int) -> bool:
+        if invalidation_state["generation"] != generation:
+            return True
+        return (
+            scope.get("read_replica", False)
+            and time.monotonic() - invalidation_state["at"] < REPLICA_MAX_LAG_SECONDS
+        )
+
+    async def send_cached(
+        self, scope: Scope, send: Send, cached: bytes, request_headers: Headers
+    ) -> None:
+        status_code, headers, route, body = unpack(cached)
+        # шаблон маршрута - для меток MetricsMiddleware
+        scope["route_path"] = route
+        etag = next((value.decode() for name, value in headers if name == b"etag"), None)
+        if etag is not None and etag_matches(request_headers.get("if-none-match"), etag):
+            status_code, body = 304, b""
+            headers = [(name, value) for name, value in headers if name != b"content-type"]
+        headers = [
+            *headers,
+            (b"content-length", str(len(body)).encode()),
+            (b"x-cache", b"HIT"),
+        ]
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -1,12 +1,30 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, update
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy import Text, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session, aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.categories import Category as CategoryModel
-from app.schemas import Category as CategorySchema, CategoryCreate
-from app.db_depends import get_async_db
+from app.schemas import Category as CategorySchema, CategoryCreate, CategoryTree
+from app.db_depends import get_async_db, get_async_read_db, is_replica_session
+from app.cache import MISSING, category_cache
+from app.invalidation import (
+    apply_events,
+    categories_changed,
+    publish,
+    responses_changed,
+)
+from app.query_budget import query_budget
+from app.response_cache import cached_response
+from app.etag import conditional_response, etag_matches, make_etag, not_modified
+from app.serialization import (
+    CATEGORY_COLUMNS,
+    CATEGORY_FIELDS,
+    dump_row,
+    dump_rows,
+    json_response,
+)
 
 
 router = APIRouter(
@@ -15,19 +33,108 @@ router = APIRouter(
 )
 
 
+# События любой записи в категории; активность категории
+# влияет и на список товаров
+CATEGORY_EVENTS = (categories_changed(), responses_changed("categories", "products"))
+
+# Заголовок If-None-Match для условных GET
+IfNoneMatch = Annotated[
+    str | None, Header(description="ETag ранее полученного ответа")
+]
+
+
 @router.get("/", response_model=list[CategorySchema])
-async def get_all_categories(db: Annotated[AsyncSession, Depends(get_async_db)]):
+@query_budget(2)
+@cached_response("categories")
+async def get_all_categories(
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    if_none_match: IfNoneMatch = None,
+):
     """
     Возвращает список всех категорий товаров.
+    Отвечает 304, если версия списка совпадает с If-None-Match.
     """
+    cached = category_cache.get(("categories",))
+    if cached is not MISSING:
+        etag, categories = cached
+        return conditional_response(if_none_match, etag, categories)
+    # запись между чтением и set() сбросит generation - список не сохранится
+    generation = category_cache.generation
+
+    # версия списка - хэш содержимого активных категорий, а не max(updated_at):
+    # now() - время начала транзакции, и запись, начатая раньше, но
+    # закоммиченная позже, не сдвинула бы максимум
+    version = await db.scalar(
+        select(
+            func.md5(
+                cast(
+                    func.json_agg(
+                        aggregate_order_by(
+                            func.json_build_array(
+                                CategoryModel.id,
+                                CategoryModel.parent_id,
+                                CategoryModel.name,
+                            ),
+                            CategoryModel.id,
+                        )
+                    ),
+                    Text,
+                )
+            )
+        ).where(CategoryModel.is_active == True)
+    )
+    etag = make_etag("categories", version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    result = await db.execute(
+        select(*CATEGORY_COLUMNS).where(CategoryModel.is_active == True)
+    )
+    categories = dump_rows(result.all(), CATEGORY_FIELDS)
+    category_cache.set(
+        ("categories",), (etag, categories), generation, is_replica_session(db)
+    )
+    return json_response(categories, headers={"ETag": etag})
+
+
+@router.get("/tree", response_model=list[CategoryTree])
+@query_budget(1)
+async def get_category_tree(db: Annotated[AsyncSession, Depends(get_async_read_db)]):
+    """
+    Возвращает дерево активных категорий, построенное по одному запросу.
+    """
+    tree = category_cache.get(("tree",))
+    if tree is not MISSING:
+        return tree
+    generation = category_cache.generation
+
+    # сортировка по пути гарантирует, что родитель идет раньше потомков
     result = await db.scalars(
-        select(CategoryModel).where(CategoryModel.is_active == True)
+        select(CategoryModel)
+        .where(CategoryModel.is_active == True)
+        .order_by(CategoryModel.path)
     )
-    categories = result.all()
-    return categories
+    nodes: dict[int, CategoryTree] = {}
+    tree = []
+    for category in result.all():
+        node = CategoryTree(
+            id=category.id,
+            name=category.name,
+            parent_id=category.parent_id,
+            is_active=category.is_active,
+        )
+        nodes[category.id] = node
+        if category.parent_id in nodes:
+            nodes[category.parent_id].children.append(node)
+        else:
+            tree.append(node)
+
+    category_cache.set(("tree",), tree, generation, is_replica_session(db))
+    return tree
 
 
 @router.post("/", response_model=CategorySchema, status_code=status.HTTP_201_CREATED)
+@query_budget(5)
 async def create_category(
     category: CategoryCreate, db: AsyncSession = Depends(get_async_db)
 ):
@@ -35,6 +142,7 @@ async def create_category(
     Создает новую категорию.
     """
     # Проверка существования parent_id, если указан
+    parent = None
     if category.parent_id is not None:
         stmt = select(CategoryModel).where(
             CategoryModel.id == category.parent_id,
@@ -47,12 +155,19 @@ async def create_category(
 
     db_category = CategoryModel(**category.model_dump())
     db.add(db_category)
+    await db.flush()  # путь включает id категории, поэтому сначала получаем его
+    db_category.path = CategoryModel.child_path(
+        parent.path if parent else None, db_category.id
+    )
+    await publish(db, *CATEGORY_EVENTS)
     await db.commit()
     await db.refresh(db_category)  # можно без этого, т.к. expire_on_commit=False
+    apply_events(CATEGORY_EVENTS)
     return db_category
 
 
 @router.put("/{category_id}", response_model=CategorySchema)
+@query_budget(5)
 async def update_category(
     category_id: int,
     category: CategoryCreate,
@@ -69,16 +184,34 @@ async def update_category(
     if db_category is None:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    if category.parent_id is not None:
-        parent_stmt = select(CategoryModel).where(
-            CategoryModel.id == category.parent_id, CategoryModel.is_active == True
-        )
-        parent_result = await db.scalars(parent_stmt)
-        parent = parent_result.first()
-        if parent is None:
-            raise HTTPException(
-                status.HTTP_400_BAD_REQUEST, detail="Parent category not found"
+    # parent_id, не переданный в теле, остается прежним (exclude_unset ниже)
+    parent_id = (
+        category.parent_id
+        if "parent_id" in category.model_fields_set
+        else db_category.parent_id
+    )
+    old_path = db_category.path
+    new_path = old_path
+    if parent_id != db_category.parent_id:
+        parent = None
+        if parent_id is not None:
+            parent_stmt = select(CategoryModel).where(
+                CategoryModel.id == parent_id, CategoryModel.is_active == True
             )
+            parent_result = await db.scalars(parent_stmt)
+            parent = parent_result.first()
+            if parent is None:
+                raise HTTPException(
+                    status.HTTP_400_BAD_REQUEST, detail="Parent category not found"
+                )
+            if parent.path.startswith(db_category.path):
+                raise HTTPException(
+                    status.HTTP_400_BAD_REQUEST,
+                    detail="Category cannot be moved into its own subtree",
+                )
+        new_path = CategoryModel.child_path(
+            parent.path if parent else None, category_id
+        )
 
     update_data = category.model_dump(exclude_unset=True)
     await db.execute(
@@ -86,28 +219,55 @@ async def update_category(
         .where(CategoryModel.id == category_id)
         .values(**update_data)
     )
+    if new_path != old_path:
+        # при переносе переписываем префикс пути у всего поддерева одним запросом
+        await db.execute(
+            update(CategoryModel)
+            .where(CategoryModel.in_subtree(old_path))
+            .values(
+                path=literal(new_path).concat(
+                    func.substr(CategoryModel.path, len(old_path) + 1)
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+    await publish(db, *CATEGORY_EVENTS)
     await db.commit()
+    apply_events(CATEGORY_EVENTS)
 
     return db_category
 
 
 @router.delete("/{category_id}", status_code=status.HTTP_200_OK)
+@query_budget(2)
 async def delete_category(
     category_id: int, db: Annotated[AsyncSession, Depends(get_async_db)]
 ):
     """
-    Логически удаляет категорию по ее ID, устанавливая is_active=False.
+    Логически удаляет категорию по ее ID вместе со всеми подкатегориями,
+    устанавливая is_active=False.
     """
-    stmt = select(CategoryModel).where(
-        CategoryModel.id == category_id, CategoryModel.is_active == True
+    # путь корня берется самосоединением в том же UPDATE;
+    # если активной категории нет, не затрагивается ни одна строка
+    root = aliased(CategoryModel)
+    result = await db.execute(
+        update(CategoryModel)
+        .where(
+            root.id == category_id,
+            root.is_active == True,
+            CategoryModel.in_subtree(root.path),
+            CategoryModel.is_active == True,
+        )
+        .values(is_active=False)
+        .returning(*CATEGORY_COLUMNS)
+        .execution_options(synchronize_session=False)
     )
-    result = await db.scalars(stmt)
-    category = result.first()
+    category = next((row for row in result if row.id == category_id), None)
     if category is None:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    category.is_active = False
-
+    await publish(db, *CATEGORY_EVENTS)
     await db.commit()
+    apply_events(CATEGORY_EVENTS)
 
-    return category
+    return json_response(dump_row(category, CATEGORY_FIELDS))
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends
+
+from app.admission import admission_stats, concurrency_class
+from app.cache import cache_stats
+from app.auth import check_admin, password_hasher
+from app.background import background
+from app.category_snapshot import category_snapshot
+from app.database import async_engine, read_engines
+from app.invalidation import invalidation_listener
+
+
+# Служебные эндпоинты для мониторинга, не публикуются в OpenAPI-схеме;
+# раскрывают внутреннее состояние, поэтому доступны только роли "admin"
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(check_admin)],
+)
+
+
+@router.get("/cache")
+@concurrency_class(None)
+async def get_cache_stats():
+    """
+    Возвращает размер и счетчики попаданий/промахов кэшей чтения.
+    """
+    return cache_stats()
+
+
+@router.get("/password-hasher")
+@concurrency_class(None)
+async def get_password_hasher_stats():
+    """
+    Возвращает загрузку и глубину очереди пула хеширования паролей.
+    """
+    return password_hasher.stats()
+
+
+@router.get("/admission")
+@concurrency_class(None)
+async def get_admission_stats():
+    """
+    Возвращает лимиты, загрузку и глубину очередей классов конкурентности.
+    """
+    return admission_stats()
+
+
+@router.get("/background")
+@concurrency_class(None)
+async def get_background_stats():
+    """
+    Возвращает очередь и счетчики фонового воркера побочных эффектов записей.
+    """
+    return background.stats()
+
+
+@router.get("/category-snapshot")
+@concurrency_class(None)
+async def get_category_snapshot_stats():
+    """
+    Возвращает размер и возраст снимка категорий и счетчики проверок по нему.
+    """
+    return category_snapshot.stats()
+
+
+@router.get("/invalidation-bus")
+@concurrency_class(None)
+async def get_invalidation_bus_stats():
+    """
+    Возвращает состояние слушателя шины инвалидации и счетчики событий.
+    """
+    return invalidation_listener.stats()
+
+
+@router.get("/pool")
+@concurrency_class(None)
+async def get_pool_stats():
+    """
+    Возвращает состояние пулов соединений основной базы и реплик: занятые
+    соединения, время ожидания соединения и число случаев исчерпания пула.
+    """
+    return {
+        "primary": async_engine.pool.stats(),
+        "replicas": [engine.pool.stats() for engine in read_engines],
+    }
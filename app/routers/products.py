@@ -1,11 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, update
+from datetime import datetime
+from decimal import Decimal
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import (
+    ARRAY,
+    ColumnElement,
+    Float,
+    Integer,
+    any_,
+    bindparam,
+    func,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import websearch_to_tsquery
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from app.models.categories import Category as CategoryModel
-from app.models.products import Product as ProductModel
-from app.schemas import Product as ProductSchema, ProductCreate
-from app.db_depends import get_async_db
+from app.models.products import Product as ProductModel, SEARCH_CONFIG
+from app.schemas import (
+    Page,
+    Product as ProductSchema,
+    ProductBatch,
+    ProductCreate,
+    ProductImportReport,
+)
+from app.db_depends import get_async_db, get_async_read_db, is_replica_session
+from app.pagination import (
+    SortOrder,
+    cursor_sort,
+    invalid_cursor,
+    next_cursor,
+    paginate,
+    parse_id,
+)
+from app.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PRODUCT_BATCH_MAX_IDS
+from app.category_snapshot import category_snapshot
+from app.cache import MISSING, product_cache
+from app.invalidation import (
+    apply_events,
+    category_products_changed,
+    product_changed,
+    publish,
+    responses_changed,
+)
+from app.product_import import ProductImporter, iter_csv_rows, iter_ndjson_rows
+from app.product_export import export_watermark, stream_products
+from app.query_budget import query_budget
+from app.admission import concurrency_class
+from app.response_cache import cached_response
+from app.etag import conditional_response, etag_matches, make_etag, not_modified
+from app.serialization import (
+    PRODUCT_COLUMNS,
+    PRODUCT_FIELDS,
+    dump_json,
+    dump_page,
+    dump_row,
+    json_response,
+    rows_to_dicts,
+)
 
 from app.models.users import User as UserModel
 from app.auth import get_current_seller
@@ -15,30 +71,220 @@ router = APIRouter(
     tags=["products"],
 )
 
+# Допустимые сортировки списков товаров; "-" означает порядок по убыванию.
+# Для каждой есть частичный индекс (см. ProductModel.__table_args__).
+ProductSort = Literal["id", "price", "-price", "rating", "-rating"]
+
+PRODUCT_SORTS: dict[str, SortOrder] = {
+    "id": SortOrder(ProductModel.id, ProductModel.id, parse=parse_id),
+    "price": SortOrder(ProductModel.price, ProductModel.id, parse=Decimal),
+    "-price": SortOrder(
+        ProductModel.price, ProductModel.id, descending=True, parse=Decimal
+    ),
+    "rating": SortOrder(ProductModel.rating, ProductModel.id, parse=float),
+    "-rating": SortOrder(
+        ProductModel.rating, ProductModel.id, descending=True, parse=float
+    ),
+}
+
+PageSize = Annotated[
+    int, Query(ge=1, le=MAX_PAGE_SIZE, description="Размер страницы")
+]
+Cursor = Annotated[
+    str | None, Query(description="Курсор, полученный на предыдущей странице")
+]
+IfNoneMatch = Annotated[
+    str | None, Header(description="ETag ранее полученного ответа")
+]
+
 
 @router.get(
     "/",
-    response_model=list[ProductSchema],
+    response_model=Page[ProductSchema],
     status_code=status.HTTP_200_OK,
 )
-async def get_all_products(db: AsyncSession = Depends(get_async_db)):
+@query_budget(1)
+@cached_response("products")
+@concurrency_class("heavy")
+async def get_all_products(
+    sort: ProductSort = "id",
+    cursor: Cursor = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_read_db),
+):
     """
-    Возвращает список всех товаров.
+    Возвращает страницу списка всех товаров.
     """
-    # products = db.scalars(
-    #     select(ProductModel).where(ProductModel.is_active == True)
-    # ).all()
+    order = PRODUCT_SORTS[sort]
+    stmt = (
+        select(*PRODUCT_COLUMNS)
+        .join(CategoryModel)
+        .where(
+            ProductModel.is_active == True,
+            CategoryModel.is_active == True,
+        )
+    )
+    result = await db.execute(paginate(stmt, sort, order, cursor, limit))
+    rows = list(result.all())
+    page_cursor = next_cursor(rows, sort, order, limit)
+
+    return json_response(dump_page(rows, PRODUCT_FIELDS, page_cursor))
+
+
+def _search_order(mode: str, q: str) -> tuple[SortOrder, ColumnElement[bool]]:
+    """
+    Возвращает порядок по релевантности и условие совпадения для режима поиска:
+    "fts" - полнотекстовый поиск по названию и описанию,
+    "fuzzy" - поиск по похожести названия (pg_trgm), устойчивый к опечаткам.
+    Оба условия используют GIN-индексы товаров.
+    """
+    if mode == "fts":
+        query = websearch_to_tsquery(SEARCH_CONFIG, q)
+        rank = func.ts_rank(ProductModel.search_vector, query, type_=Float)
+        condition = ProductModel.search_vector.op("@@")(query)
+    else:
+        rank = func.similarity(ProductModel.name, q, type_=Float)
+        condition = ProductModel.name.op("%")(q)
+    order = SortOrder(rank, ProductModel.id, descending=True, parse=float)
+    return order, condition
 
-    result = await db.scalars(
-        select(ProductModel)
+
+@router.get(
+    "/search",
+    response_model=Page[ProductSchema],
+    status_code=status.HTTP_200_OK,
+)
+@query_budget(2)
+@concurrency_class("heavy")
+async def search_products(
+    q: Annotated[
+        str, Query(min_length=2, max_length=100, description="Поисковый запрос")
+    ],
+    category_id: Annotated[
+        int | None, Query(description="Искать только в указанной категории")
+    ] = None,
+    cursor: Cursor = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Ищет товары по названию и описанию, результаты упорядочены по релевантности.
+    Если полнотекстовый поиск ничего не нашел, выполняется нечеткий поиск
+    по названию. Режим поиска запоминается в курсоре следующей страницы.
+    """
+    modes = [cursor_sort(cursor)] if cursor is not None else ["fts", "fuzzy"]
+    if not set(modes) <= {"fts", "fuzzy"}:
+        raise invalid_cursor
+    for mode in modes:
+        order, condition = _search_order(mode, q)
+        stmt = (
+            select(*PRODUCT_COLUMNS, order.key)
+            .join(CategoryModel)
+            .where(
+                condition,
+                ProductModel.is_active == True,
+                CategoryModel.is_active == True,
+            )
+        )
+        if category_id is not None:
+            stmt = stmt.where(ProductModel.category_id == category_id)
+
+        result = await db.execute(paginate(stmt, mode, order, cursor, limit))
+        rows = list(result.all())
+        if rows:
+            break
+
+    # ранг - последняя колонка строки
+    page_cursor = next_cursor(
+        rows, mode, order, limit, position=lambda row: (row[-1], row.id)
+    )
+    return json_response(dump_page(rows, PRODUCT_FIELDS, page_cursor))
+
+
+def _parse_ids(values: list[str]) -> list[int]:
+    """
+    Разбирает ID из повторяющихся параметров и/или списков через запятую
+    (?ids=1,2&ids=3), убирая повторы с сохранением порядка.
+    """
+    try:
+        ids = [int(value) for item in values for value in item.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="ids must be integers",
+        )
+    ids = list(dict.fromkeys(ids))
+    if not ids or len(ids) > PRODUCT_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Expected from 1 to {PRODUCT_BATCH_MAX_IDS} ids",
+        )
+    return ids
+
+
+@router.get(
+    "/batch",
+    response_model=ProductBatch,
+    status_code=status.HTTP_200_OK,
+)
+@query_budget(1)
+async def get_products_batch(
+    ids: Annotated[
+        list[str],
+        Query(description="ID товаров через запятую или повторяющимся параметром"),
+    ],
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Возвращает несколько товаров по списку ID одним запросом
+    в порядке запроса; ненайденные и неактивные ID перечисляются в missing.
+    """
+    product_ids = _parse_ids(ids)
+    # массив одним параметром: текст запроса не зависит от числа ID
+    result = await db.execute(
+        select(*PRODUCT_COLUMNS)
         .join(CategoryModel)
         .where(
+            ProductModel.id == any_(bindparam("ids", product_ids, type_=ARRAY(Integer))),
             ProductModel.is_active == True,
             CategoryModel.is_active == True,
         )
     )
+    found = {row.id: row for row in result.all()}
+    return json_response(
+        dump_json(
+            {
+                "items": rows_to_dicts(
+                    (found[product_id] for product_id in product_ids if product_id in found),
+                    PRODUCT_FIELDS,
+                ),
+                "missing": [
+                    product_id for product_id in product_ids if product_id not in found
+                ],
+            }
+        )
+    )
 
-    return result.all()
+
+async def _category_is_active(db: AsyncSession, category_id: int) -> bool:
+    """
+    Проверяет активность категории по снимку категорий процесса; в базу
+    идет, только если снимка нет или категории в нем нет. Найденная в базе
+    категория, которой нет в снимке, - повод перезагрузить снимок.
+    """
+    if category_snapshot.is_active(category_id):
+        return True
+    found = await db.scalar(
+        select(CategoryModel.id).where(
+            CategoryModel.id == category_id,
+            CategoryModel.is_active == True,
+        )
+    )
+    if found is None:
+        return False
+    if category_snapshot.current is not None:
+        category_snapshot.invalidate()
+    return True
 
 
 @router.post(
@@ -46,6 +292,7 @@ async def get_all_products(db: AsyncSession = Depends(get_async_db)):
     response_model=ProductSchema,
     status_code=status.HTTP_201_CREATED,
 )
+@query_budget(5)
 async def create_product(
     product: ProductCreate,
     db: AsyncSession = Depends(get_async_db),
@@ -54,13 +301,7 @@ async def create_product(
     """
     Создает новый товар, привязанный к текущему продавцу (только для "seller")
     """
-    category = await db.scalar(
-        select(CategoryModel).where(
-            CategoryModel.id == product.category_id,
-            CategoryModel.is_active == True,
-        )
-    )
-    if category is None:
+    if not await _category_is_active(db, product.category_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Category not found",
@@ -68,42 +309,232 @@ async def create_product(
 
     product_to_db = ProductModel(**product.model_dump(), seller_id=current_user.id)
     db.add(product_to_db)
+    await db.flush()
+    events = (
+        product_changed(product_to_db.id, product_to_db.category_id),
+        responses_changed("products"),
+    )
+    await publish(db, *events)
     await db.commit()
     await db.refresh(product_to_db)
+    apply_events(events)
 
     return product_to_db
 
 
+# Форматы выгрузки каталога и их типы содержимого
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}
+        }
+    },
+)
+@query_budget(1)
+@concurrency_class("heavy")
+async def export_products(
+    export_format: Annotated[
+        Literal["ndjson", "csv"], Query(alias="format", description="Формат выгрузки")
+    ] = "ndjson",
+    updated_since: Annotated[
+        datetime | None,
+        Query(description="Выгрузить только товары, измененные с этого момента"),
+    ] = None,
+):
+    """
+    Потоково выгружает каталог товаров в NDJSON или CSV.
+    С updated_since выгружаются все измененные товары, включая удаленные,
+    что позволяет партнерам синхронизировать копию каталога инкрементально.
+    Следующую выгрузку нужно запрашивать с updated_since из заголовка
+    X-Export-Watermark.
+    """
+    # точка продолжения берется до того, как генератор откроет транзакцию
+    watermark = export_watermark()
+    return StreamingResponse(
+        stream_products(export_format, updated_since),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="products.{export_format}"',
+            # "Z" вместо "+00:00": значение подставляется в URL как есть
+            "X-Export-Watermark": watermark.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        },
+    )
+
+
+# Поддерживаемые форматы массового импорта (по Content-Type)
+IMPORT_FORMATS = {
+    "text/csv": iter_csv_rows,
+    "application/x-ndjson": iter_ndjson_rows,
+    "application/jsonl": iter_ndjson_rows,
+}
+
+
+@router.post(
+    "/import",
+    response_model=ProductImportReport,
+    status_code=status.HTTP_200_OK,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                content_type: {"schema": {"type": "string"}}
+                for content_type in IMPORT_FORMATS
+            },
+        }
+    },
+)
+@query_budget(None, allow_repeats=True)
+@concurrency_class("heavy")
+async def import_products(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserModel = Depends(get_current_seller),
+):
+    """
+    Массово загружает товары текущего продавца из CSV с заголовком (text/csv)
+    или NDJSON (application/x-ndjson), только для "seller".
+    Тело запроса обрабатывается потоково, пакетами через COPY; строки с ошибками
+    пропускаются и перечисляются в отчете.
+    """
+    content_type = request.headers.get("content-type", "")
+    parse_rows = IMPORT_FORMATS.get(content_type.split(";")[0].strip().lower())
+    if parse_rows is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Supported content types: {', '.join(IMPORT_FORMATS)}",
+        )
+
+    importer = ProductImporter(db, current_user.id)
+    try:
+        async for line, row in parse_rows(request.stream()):
+            await importer.add(line, row)
+        await importer.flush()
+    finally:
+        # импорт коммитится пачками, поэтому события уходят отдельной
+        # транзакцией после него (и после ошибки - часть пачек уже записана)
+        events = (
+            category_products_changed(*importer.touched_categories),
+            responses_changed("products"),
+        )
+        # после ошибки транзакция сессии может быть прервана
+        await db.rollback()
+        await publish(db, *events)
+        await db.commit()
+        apply_events(events)
+
+    return importer.report()
+
+
 @router.get(
     "/category/{category_id}",
-    response_model=list[ProductSchema],
+    response_model=Page[ProductSchema],
     status_code=status.HTTP_200_OK,
 )
+@query_budget(2)
 async def get_products_by_category(
-    category_id: int, db: AsyncSession = Depends(get_async_db)
+    category_id: int,
+    sort: ProductSort = "id",
+    cursor: Cursor = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    if_none_match: IfNoneMatch = None,
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
-    Возвращает список товаров в указанной категории по ее ID.
+    Возвращает страницу списка товаров в указанной категории по ее ID.
+    ETag страницы строится по id и updated_at ее товаров; при совпадении
+    с If-None-Match отвечает 304 без сериализации. Версии строк приходят
+    из запроса самой страницы, поэтому промах кэша и для 304 стоит полного
+    запроса страницы.
     """
-    category = await db.scalar(
-        select(CategoryModel).where(
-            CategoryModel.id == category_id,
-            CategoryModel.is_active == True,
-        )
-    )
-    if category is None:
+    cache_key = ("category_products", category_id, sort, cursor, limit)
+    cached = product_cache.get(cache_key)
+    if cached is not MISSING:
+        etag, page = cached
+        return conditional_response(if_none_match, etag, page)
+    # запись между чтением и set() сбросит generation - страница не сохранится
+    generation = product_cache.generation
+
+    if not await _category_is_active(db, category_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
         )
 
-    result = await db.scalars(
-        select(ProductModel).where(
-            ProductModel.category_id == category_id,
+    order = PRODUCT_SORTS[sort]
+    stmt = select(*PRODUCT_COLUMNS, ProductModel.updated_at).where(
+        ProductModel.category_id == category_id,
+        ProductModel.is_active == True,
+    )
+    result = await db.execute(paginate(stmt, sort, order, cursor, limit))
+    rows = list(result.all())
+    page_cursor = next_cursor(rows, sort, order, limit)
+
+    # тело страницы однозначно определяется версиями ее строк и курсором
+    etag = make_etag(
+        "category_products",
+        [(row.id, row.updated_at) for row in rows],
+        page_cursor,
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    # в кэше хранится уже сериализованная страница
+    page = dump_page(rows, PRODUCT_FIELDS, page_cursor)
+    product_cache.set(cache_key, (etag, page), generation, is_replica_session(db))
+    return json_response(page, headers={"ETag": etag})
+
+
+@router.get(
+    "/category/{category_id}/subtree",
+    response_model=Page[ProductSchema],
+    status_code=status.HTTP_200_OK,
+)
+@query_budget(2)
+@concurrency_class("heavy")
+async def get_products_by_category_subtree(
+    category_id: int,
+    sort: ProductSort = "id",
+    cursor: Cursor = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Возвращает страницу товаров из указанной категории и всех ее подкатегорий.
+    Поддерево выбирается диапазоном по материализованному пути в том же запросе.
+    """
+    root = aliased(CategoryModel)
+    order = PRODUCT_SORTS[sort]
+    stmt = (
+        select(*PRODUCT_COLUMNS)
+        .join(CategoryModel, ProductModel.category_id == CategoryModel.id)
+        .join(root, CategoryModel.in_subtree(root.path))
+        .where(
+            root.id == category_id,
+            root.is_active == True,
+            CategoryModel.is_active == True,
             ProductModel.is_active == True,
         )
     )
+    result = await db.execute(paginate(stmt, sort, order, cursor, limit))
+    rows = list(result.all())
+
+    # пустая первая страница - повод проверить, существует ли категория
+    if not rows and cursor is None:
+        if not await _category_is_active(db, category_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
+            )
 
-    return result.all()
+    page_cursor = next_cursor(rows, sort, order, limit)
+    return json_response(dump_page(rows, PRODUCT_FIELDS, page_cursor))
 
 
 @router.get(
@@ -111,16 +542,36 @@ async def get_products_by_category(
     response_model=ProductSchema,
     status_code=status.HTTP_200_OK,
 )
-async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+@query_budget(1)
+async def get_product(
+    product_id: int,
+    if_none_match: IfNoneMatch = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
     """
     Возвращает детальную информацию о товаре по его ID.
+    Отвечает 304, если версия товара совпадает с If-None-Match.
     """
-    product = await db.scalar(
-        select(ProductModel).where(
-            ProductModel.id == product_id,
-            ProductModel.is_active == True,
+    cached = product_cache.get(("product", product_id))
+    if cached is not MISSING:
+        etag, content = cached
+        return conditional_response(if_none_match, etag, content)
+    generation = product_cache.generation
+
+    product = (
+        await db.execute(
+            select(
+                *PRODUCT_COLUMNS,
+                ProductModel.updated_at,
+                CategoryModel.is_active.label("category_is_active"),
+            )
+            .join(CategoryModel)
+            .where(
+                ProductModel.id == product_id,
+                ProductModel.is_active == True,
+            )
         )
-    )
+    ).first()
 
     if not product:
         raise HTTPException(
@@ -128,20 +579,50 @@ async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db))
             detail="Product not found",
         )
 
-    category = await db.scalar(
-        select(CategoryModel).where(
-            CategoryModel.id == product.category_id,
-            CategoryModel.is_active == True,
-        )
-    )
-
-    if not category:
+    if not product.category_is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Category not found",
         )
 
-    return product
+    etag = make_etag("product", product.id, product.updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    content = dump_row(product, PRODUCT_FIELDS)
+    product_cache.set(
+        ("product", product_id), (etag, content), generation, is_replica_session(db)
+    )
+    return json_response(content, headers={"ETag": etag})
+
+
+async def _product_write_error(
+    db: AsyncSession, product_id: int, seller_id: int, action: str
+) -> HTTPException:
+    """
+    Выясняет, почему условный UPDATE товара не затронул ни одной строки.
+    Выполняется только при ошибке, успешная запись обходится одним запросом.
+    """
+    owner_id = await db.scalar(
+        select(ProductModel.seller_id).where(
+            ProductModel.id == product_id,
+            ProductModel.is_active == True,
+        )
+    )
+    if owner_id is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found",
+        )
+    if owner_id != seller_id:
+        return HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You can only {action} your own products",
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Category not found",
+    )
 
 
 @router.put(
@@ -149,6 +630,7 @@ async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db))
     response_model=ProductSchema,
     status_code=status.HTTP_200_OK,
 )
+@query_budget(3)
 async def update_product(
     product_id: int,
     new_data: ProductCreate,
@@ -159,50 +641,47 @@ async def update_product(
     Обновляет товар по его ID, если он принадлежит текущему продавцу
     (только для "seller").
     """
-    product = await db.scalar(
-        select(ProductModel).where(
+    # все проверки - в условии UPDATE; прежняя категория берется из снимка
+    # строки до изменения (самосоединение), чтобы сбросить кэш обеих категорий
+    old = aliased(ProductModel)
+    result = await db.execute(
+        update(ProductModel)
+        .where(
             ProductModel.id == product_id,
             ProductModel.is_active == True,
+            ProductModel.seller_id == current_user.id,
+            old.id == ProductModel.id,
+            select(CategoryModel.id)
+            .where(
+                CategoryModel.id == new_data.category_id,
+                CategoryModel.is_active == True,
+            )
+            .exists(),
         )
+        .values(**new_data.model_dump())
+        .returning(*PRODUCT_COLUMNS, old.category_id.label("old_category_id"))
+        .execution_options(synchronize_session=False)
     )
+    product = result.first()
+    if product is None:
+        raise await _product_write_error(db, product_id, current_user.id, "update")
 
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found",
-        )
-
-    if product.seller_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only update your own products",
-        )
-
-    category = await db.scalar(
-        select(CategoryModel).where(
-            CategoryModel.id == product.category_id,
-            CategoryModel.is_active == True,
-        )
-    )
-
-    if not category:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Category not found",
-        )
-
-    await db.execute(
-        update(ProductModel)
-        .where(ProductModel.id == product_id)
-        .values(**new_data.model_dump())
+    events = (
+        product_changed(product_id, product.old_category_id, product.category_id),
+        responses_changed("products", f"product:{product_id}"),
     )
+    await publish(db, *events)
     await db.commit()
-    await db.refresh(product)
-
-    return product
+    apply_events(events)
+    return json_response(dump_row(product, PRODUCT_FIELDS))
 
 
-@router.delete("/{product_id}", status_code=status.HTTP_200_OK, response_model=ProductSchema,)
+@router.delete(
+    "/{product_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=ProductSchema,
+)
+@query_budget(3)
 async def delete_product(
     product_id: int,
     db: AsyncSession = Depends(get_async_db),
@@ -212,40 +691,32 @@ async def delete_product(
     Выполняет мягкое удаление товара по его ID, если он принадлежит
     текущему продавцу (только для "seller")
     """
-    product = await db.scalar(
-        select(ProductModel).where(
+    result = await db.execute(
+        update(ProductModel)
+        .where(
             ProductModel.id == product_id,
             ProductModel.is_active == True,
+            ProductModel.seller_id == current_user.id,
+            select(CategoryModel.id)
+            .where(
+                CategoryModel.id == ProductModel.category_id,
+                CategoryModel.is_active == True,
+            )
+            .exists(),
         )
+        .values(is_active=False)
+        .returning(*PRODUCT_COLUMNS)
+        .execution_options(synchronize_session=False)
     )
+    product = result.first()
+    if product is None:
+        raise await _product_write_error(db, product_id, current_user.id, "delete")
 
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found",
-        )
-    
-    if product.seller_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only delete your own products",
-        )
-
-    category = await db.scalar(
-        select(CategoryModel).where(
-            CategoryModel.id == product.category_id,
-            CategoryModel.is_active == True,
-        )
+    events = (
+        product_changed(product_id, product.category_id),
+        responses_changed("products", f"product:{product_id}"),
     )
-
-    if not category:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Category not found",
-        )
-
-    product.is_active = False
+    await publish(db, *events)
     await db.commit()
-    await db.refresh(product)
-
-    return product
\ No newline at end of file
+    apply_events(events)
+    return json_response(dump_row(product, PRODUCT_FIELDS))
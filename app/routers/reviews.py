@@ -1,15 +1,30 @@
+from datetime import datetime
+from typing import Literal
+
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from app.db_depends import get_async_db
+from app.db_depends import get_async_db, get_async_read_db
 from app.models.reviews import Review as ReviewModel
-from app.schemas import ReviewCreate, Review as ReviewSchema
+from app.schemas import Page, ReviewCreate, Review as ReviewSchema, ReviewSummary
 from app.models.users import User
 from app.models.products import Product
 from app.auth import get_current_buyer, check_admin
-from app.utils import update_product_rating
-from app.routers.products import router as product_router
+from app.utils import GRADES, deactivate_review, grade_column, insert_review
+from app.query_budget import query_budget
+from app.response_cache import cached_response
+from app.invalidation import apply_events, product_changed, publish, responses_changed
+from app.serialization import (
+    REVIEW_COLUMNS,
+    REVIEW_FIELDS,
+    dump_page,
+    dump_row,
+    json_response,
+)
+from app.config import DEFAULT_PAGE_SIZE
+from app.pagination import SortOrder, next_cursor, paginate
+from app.routers.products import Cursor, PageSize, router as product_router
 
 
 router = APIRouter(
@@ -23,41 +38,118 @@ product_not_found = HTTPException(
 )
 
 
-@router.get("/", response_model=list[ReviewSchema])
-async def get_all_reviews(db: AsyncSession = Depends(get_async_db)):
+# Порядок отзывов: по умолчанию сначала новые
+ReviewSort = Literal["-comment_date", "comment_date"]
+
+REVIEW_SORTS: dict[str, SortOrder] = {
+    "-comment_date": SortOrder(
+        ReviewModel.comment_date,
+        ReviewModel.id,
+        descending=True,
+        parse=datetime.fromisoformat,
+    ),
+    "comment_date": SortOrder(
+        ReviewModel.comment_date, ReviewModel.id, parse=datetime.fromisoformat
+    ),
+}
+
+
+@router.get("/", response_model=Page[ReviewSchema])
+@query_budget(1)
+async def get_all_reviews(
+    sort: ReviewSort = "-comment_date",
+    cursor: Cursor = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_read_db),
+):
     """
-    Возвращает список всех активных отзывов.
+    Возвращает страницу списка всех активных отзывов.
     """
-    result = await db.scalars(select(ReviewModel).where(ReviewModel.is_active == True))
-    return result.all()
+    order = REVIEW_SORTS[sort]
+    stmt = select(*REVIEW_COLUMNS).where(ReviewModel.is_active == True)
+    result = await db.execute(paginate(stmt, sort, order, cursor, limit))
+    rows = list(result.all())
+    page_cursor = next_cursor(rows, sort, order, limit)
+
+    return json_response(dump_page(rows, REVIEW_FIELDS, page_cursor))
 
 
-@product_router.get("/{product_id}/reviews", response_model=list[ReviewSchema])
+@product_router.get("/{product_id}/reviews", response_model=Page[ReviewSchema])
+@query_budget(2)
+@cached_response("product:{product_id}")
 async def get_product_reviews(
-    product_id: int, db: AsyncSession = Depends(get_async_db)
+    product_id: int,
+    sort: ReviewSort = "-comment_date",
+    cursor: Cursor = None,
+    limit: PageSize = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
-    Возвращает список активных отзывов товара с данным ID.
+    Возвращает страницу списка активных отзывов товара с данным ID.
     """
-    product = await db.scalar(
-        select(Product).where(
-            Product.id == product_id,
+    order = REVIEW_SORTS[sort]
+    stmt = (
+        select(*REVIEW_COLUMNS)
+        .join(Product)
+        .where(
+            ReviewModel.product_id == product_id,
+            ReviewModel.is_active == True,
             Product.is_active == True,
         )
     )
+    result = await db.execute(paginate(stmt, sort, order, cursor, limit))
+    rows = list(result.all())
+
+    # пустая первая страница - повод проверить, существует ли товар
+    if not rows and cursor is None:
+        product = await db.scalar(
+            select(Product.id).where(
+                Product.id == product_id,
+                Product.is_active == True,
+            )
+        )
+        if product is None:
+            raise product_not_found
+
+    page_cursor = next_cursor(rows, sort, order, limit)
+    return json_response(dump_page(rows, REVIEW_FIELDS, page_cursor))
+
+
+@product_router.get("/{product_id}/reviews/summary", response_model=ReviewSummary)
+@query_budget(1)
+@cached_response("product:{product_id}")
+async def get_product_review_summary(
+    product_id: int, db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Возвращает число отзывов, среднюю оценку и распределение оценок товара
+    по счетчикам товара, которые обновляются при каждом изменении отзывов.
+    """
+    product = (
+        await db.execute(
+            select(
+                Product.rating_count,
+                Product.rating,
+                *(grade_column(grade) for grade in GRADES),
+            ).where(
+                Product.id == product_id,
+                Product.is_active == True,
+            )
+        )
+    ).first()
     if product is None:
         raise product_not_found
-    reviews = await db.scalars(
-        select(ReviewModel).where(
-            ReviewModel.product_id == product_id,
-            ReviewModel.is_active == True,
-        )
-    )
 
-    return reviews
+    return ReviewSummary(
+        product_id=product_id,
+        count=product.rating_count,
+        average=product.rating,
+        grades={grade: product[2 + number] for number, grade in enumerate(GRADES)},
+    )
 
 
 @router.post("/", response_model=ReviewSchema)
+@query_budget(3)
 async def create_review(
     review: ReviewCreate,
     db: AsyncSession = Depends(get_async_db),
@@ -66,35 +158,38 @@ async def create_review(
     """
     Создает новый отзыв для существующего товара (только для "buyer")
     """
-    product = await db.scalar(
-        select(Product).where(
-            Product.id == review.product_id,
-            Product.is_active == True,
-        )
+    # отзыв и изменение рейтинга - один запрос в одной транзакции
+    created = await insert_review(
+        db, current_user.id, review.product_id, review.comment, review.grade
     )
-    if product is None:
-        raise product_not_found
-    already_posted = await db.scalars(
-        select(ReviewModel).where(
-            ReviewModel.user_id == current_user.id,
-            ReviewModel.product_id == product.id,
+    if created is None:
+        # второй запрос - только чтобы различить причину отказа
+        product = await db.scalar(
+            select(Product.id).where(
+                Product.id == review.product_id,
+                Product.is_active == True,
+            )
         )
-    )
-    if already_posted.first():
+        if product is None:
+            raise product_not_found
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Only one review per product",
         )
 
-    review_to_db = ReviewModel(**review.model_dump(), user_id=current_user.id)
-    db.add(review_to_db)
+    # рейтинг товара входит в список товаров
+    events = (
+        product_changed(created.product_id, created.category_id),
+        responses_changed("products", f"product:{created.product_id}"),
+    )
+    await publish(db, *events)
     await db.commit()
-    await update_product_rating(db, product.id)
-    await db.refresh(review_to_db)
-    return review_to_db
+    apply_events(events)
+    return json_response(dump_row(created, REVIEW_FIELDS))
 
 
 @router.delete("/{review_id}")
+@query_budget(3)
 async def delete_review(
     review_id: int,
     db: AsyncSession = Depends(get_async_db),
@@ -103,19 +198,19 @@ async def delete_review(
     """
     Логическое удаление отзыва по его ID (только для роли "admin").
     """
-    review = await db.scalar(
-        select(ReviewModel)
-        .where(
-            ReviewModel.id == review_id,
-            ReviewModel.is_active == True,
-        )
-    )
-    if review is None:
+    # отзыв и рейтинг товара меняются одним запросом
+    product = await deactivate_review(db, review_id)
+    if product is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Review doesn't exist or is inactive",
         )
-    review.is_active = False
+    # рейтинг товара входит в список товаров
+    events = (
+        product_changed(product.id, product.category_id),
+        responses_changed("products", f"product:{product.id}"),
+    )
+    await publish(db, *events)
     await db.commit()
-    await update_product_rating(db, review.product_id)
+    apply_events(events)
     return {"message": "Review deleted"}
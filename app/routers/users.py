@@ -1,7 +1,8 @@
 import jwt
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.models.users import User as UserModel
@@ -12,7 +13,11 @@ from app.auth import (
     verify_password,
     create_access_token,
     create_refresh_token,
+    check_admin,
 )
+from app.invalidation import apply_events, publish, user_changed
+from app.query_budget import query_budget
+from app.admission import concurrency_class
 from app.config import SECRET_KEY, ALGORITHM
 
 
@@ -20,33 +25,43 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/", response_model=UserSchema, status_code=status.HTTP_201_CREATED)
+@query_budget(2)
+@concurrency_class("auth")
 async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Регистрирует нового пользователя с ролью 'buyer' или 'seller'
     """
-    # Проверка уникальности email
-    result = await db.scalars(select(UserModel).where(UserModel.email == user.email))
-    if result.first():
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Email already registered",
-        )
-
-    # Создание объекта пользователя с хешированным паролем
-    db_user = UserModel(
-        email=user.email,
-        hashed_password=hash_password(user.password.get_secret_value()),
-        role=user.role,
+    email_taken = HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Email already registered",
     )
+    # дешевая проверка до bcrypt: повторная регистрация занятого email
+    # не должна занимать место в пуле хеширования
+    if await db.scalar(select(UserModel.id).where(UserModel.email == user.email)):
+        raise email_taken
 
-    # Добавление в сессию и сохранение в базе
-    db.add(db_user)
+    # Гонку двух регистраций закрывает уникальный индекс: занятый email
+    # не вставляется, и RETURNING ничего не возвращает
+    db_user = await db.scalar(
+        insert(UserModel)
+        .values(
+            email=user.email,
+            hashed_password=await hash_password(user.password.get_secret_value()),
+            role=user.role,
+        )
+        .on_conflict_do_nothing(index_elements=[UserModel.email])
+        .returning(UserModel)
+    )
+    if db_user is None:
+        raise email_taken
     await db.commit()
 
     return db_user
 
 
 @router.post("/token")
+@query_budget(1)
+@concurrency_class("auth")
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_async_db),
@@ -55,9 +70,14 @@ async def login(
     Аутентифицирует пользователя и возвращает JWT с email, role и id (access и refresh)
     """
     user = await db.scalar(
-        select(UserModel).where(UserModel.email == form_data.username)
+        select(UserModel).where(
+            UserModel.email == form_data.username,
+            UserModel.is_active == True,
+        )
     )
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -68,6 +88,7 @@ async def login(
             "sub": user.email,
             "role": user.role,
             "id": user.id,
+            "ver": user.token_version,
         }
     )
 
@@ -76,6 +97,7 @@ async def login(
             "sub": user.email,
             "role": user.role,
             "id": user.id,
+            "ver": user.token_version,
         }
     )
 
@@ -87,6 +109,8 @@ async def login(
 
 
 @router.post("/refresh-token")
+@query_budget(1)
+@concurrency_class("auth")
 async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async_db)):
     """
     Обновляет access_token с помощью refresh_token
@@ -99,6 +123,7 @@ async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async
     try:
         payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
+        token_version: int = payload.get("ver", 0)
         if email is None:
             raise credentials_exception
     except jwt.PyJWTError:
@@ -109,13 +134,14 @@ async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async
             UserModel.is_active == True,
         )
     )
-    if user is None:
+    if user is None or user.token_version != token_version:
         raise credentials_exception
     access_token = create_access_token(
         data={
             "sub": user.email,
             "role": user.role,
             "id": user.id,
+            "ver": user.token_version,
         }
     )
 
@@ -123,3 +149,54 @@ async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async
         "access_token": access_token,
         "token_type": "bearer",
     }
+
+
+async def _revoke_user_tokens(
+    db: AsyncSession, user_id: int, **values: bool
+) -> UserModel:
+    """
+    Увеличивает версию токенов пользователя (и меняет переданные поля),
+    из-за чего все ранее выданные ему токены перестают приниматься.
+    """
+    user = await db.scalar(
+        update(UserModel)
+        .where(UserModel.id == user_id)
+        .values(token_version=UserModel.token_version + 1, **values)
+        .returning(UserModel)
+    )
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+    events = (user_changed(user_id),)
+    await publish(db, *events)
+    await db.commit()
+    apply_events(events)
+    return user
+
+
+@router.post("/{user_id}/revoke-tokens", response_model=UserSchema)
+@query_budget(3)
+async def revoke_user_tokens(
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserModel = Depends(check_admin),
+):
+    """
+    Отзывает все выданные пользователю токены (только для роли "admin")
+    """
+    return await _revoke_user_tokens(db, user_id)
+
+
+@router.post("/{user_id}/deactivate", response_model=UserSchema)
+@query_budget(3)
+async def deactivate_user(
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserModel = Depends(check_admin),
+):
+    """
+    Деактивирует пользователя и отзывает его токены (только для роли "admin")
+    """
+    return await _revoke_user_tokens(db, user_id, is_active=False)
@@ -1,4 +1,4 @@
-from typing import Annotated
+from typing import Annotated, Generic, TypeVar
 from datetime import datetime
 from pydantic import BaseModel, Field, ConfigDict, HttpUrl, EmailStr, SecretStr
 
@@ -46,6 +46,18 @@ class Category(BaseCategory):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CategoryTree(Category):
+    """
+    Модель для ответа с деревом категорий.
+    Используется в GET /categories/tree.
+    """
+
+    children: Annotated[
+        list["CategoryTree"],
+        Field(default_factory=list, description="Дочерние категории"),
+    ]
+
+
 class BaseProduct(BaseModel):
     """
     Базовая модель для товара.
@@ -67,7 +79,11 @@ class BaseProduct(BaseModel):
             description="Описание товара (до 500 символов)",
         ),
     ]
-    price: Annotated[float, Field(gt=0, description="Цена товара (больше 0)")]
+    # верхние границы - пределы колонок Numeric(10, 2) и Integer
+    price: Annotated[
+        float,
+        Field(gt=0, lt=100_000_000, description="Цена товара (больше 0, меньше 10^8)"),
+    ]
     image_url: Annotated[
         str | None,
         Field(
@@ -77,10 +93,18 @@ class BaseProduct(BaseModel):
         ),
     ]
     stock: Annotated[
-        int, Field(ge=0, description="Количество товара на складе (0 или больше)")
+        int,
+        Field(
+            ge=0,
+            le=2**31 - 1,
+            description="Количество товара на складе (0 или больше)",
+        ),
     ]
     category_id: Annotated[
-        int, Field(description="ID категории, к которой относится товар")
+        int,
+        Field(
+            ge=1, le=2**31 - 1, description="ID категории, к которой относится товар"
+        ),
     ]
 
 
@@ -106,6 +130,64 @@ class Product(BaseProduct):
     model_config = ConfigDict(from_attributes=True)
 
 
+ItemT = TypeVar("ItemT")
+
+
+class Page(BaseModel, Generic[ItemT]):
+    """
+    Модель для ответа со страницей списка при курсорной пагинации.
+    """
+
+    items: Annotated[list[ItemT], Field(description="Элементы текущей страницы")]
+    next_cursor: Annotated[
+        str | None,
+        Field(
+            default=None,
+            description="Курсор следующей страницы (null, если страница последняя)",
+        ),
+    ]
+
+
+class ProductBatch(BaseModel):
+    """
+    Модель для ответа на запрос нескольких товаров по списку ID.
+    """
+
+    items: Annotated[
+        list[Product], Field(description="Найденные товары в порядке запроса")
+    ]
+    missing: Annotated[
+        list[int],
+        Field(description="ID, для которых активный товар не найден"),
+    ]
+
+
+class ProductImportError(BaseModel):
+    """
+    Ошибка в строке файла массового импорта товаров.
+    """
+
+    line: Annotated[int, Field(description="Номер строки во входном файле")]
+    errors: Annotated[list[str], Field(description="Описание ошибок")]
+
+
+class ProductImportReport(BaseModel):
+    """
+    Модель для ответа с результатом массового импорта товаров.
+    """
+
+    total_rows: Annotated[int, Field(description="Всего обработано строк")]
+    imported: Annotated[int, Field(description="Загружено товаров")]
+    failed: Annotated[int, Field(description="Строк с ошибками")]
+    errors: Annotated[
+        list[ProductImportError],
+        Field(description="Ошибки по строкам (не больше IMPORT_MAX_ERRORS)"),
+    ]
+    errors_truncated: Annotated[
+        bool, Field(description="Список ошибок обрезан до IMPORT_MAX_ERRORS")
+    ]
+
+
 class BaseUser(BaseModel):
     email: EmailStr = Field(description="Email пользователя")
     role: str = Field(
@@ -187,3 +269,18 @@ class Review(BaseReview):
     ]
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ReviewSummary(BaseModel):
+    """
+    Сводка по активным отзывам товара: число, средняя оценка и распределение
+    оценок. Берется из счетчиков товара, а не агрегированием отзывов.
+    """
+
+    product_id: Annotated[int, Field(description="ID товара")]
+    count: Annotated[int, Field(description="Число активных отзывов")]
+    average: Annotated[float, Field(description="Средняя оценка (0, если отзывов нет)")]
+    grades: Annotated[
+        dict[int, int],
+        Field(description="Число отзывов с каждой оценкой от 1 до 5"),
+    ]
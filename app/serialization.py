@@ -0,0 +1,94 @@
+from collections.abc import Iterable, Sequence
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi import Response
+
+from app.models.categories import Category as CategoryModel
+from app.models.products import Product as ProductModel
+from app.models.reviews import Review as ReviewModel
+
+# Колонки, которые выбираются для списков вместо целых ORM-объектов.
+# Порядок совпадает с порядком полей в схемах ответа (app.schemas).
+PRODUCT_COLUMNS = (
+    ProductModel.name,
+    ProductModel.description,
+    ProductModel.price,
+    ProductModel.image_url,
+    ProductModel.stock,
+    ProductModel.category_id,
+    ProductModel.id,
+    ProductModel.is_active,
+    ProductModel.rating,
+)
+CATEGORY_COLUMNS = (
+    CategoryModel.name,
+    CategoryModel.parent_id,
+    CategoryModel.id,
+    CategoryModel.is_active,
+)
+REVIEW_COLUMNS = (
+    ReviewModel.product_id,
+    ReviewModel.comment,
+    ReviewModel.grade,
+    ReviewModel.id,
+    ReviewModel.user_id,
+    ReviewModel.comment_date,
+    ReviewModel.is_active,
+)
+
+PRODUCT_FIELDS = tuple(column.key for column in PRODUCT_COLUMNS)
+CATEGORY_FIELDS = tuple(column.key for column in CATEGORY_COLUMNS)
+REVIEW_FIELDS = tuple(column.key for column in REVIEW_COLUMNS)
+
+
+def _default(value: Any) -> Any:
+    # цена в схеме ответа - float
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def rows_to_dicts(rows: Iterable[Sequence], fields: Sequence[str]) -> list[dict]:
+    """
+    Превращает строки результата в словари по именам полей.
+    Лишние колонки в конце строки (например, ранг поиска) отбрасываются.
+    """
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+def dump_rows(rows: Iterable[Sequence], fields: Sequence[str]) -> bytes:
+    """
+    Сериализует строки в JSON-массив, минуя ORM-объекты и валидацию pydantic.
+    """
+    return dump_json(rows_to_dicts(rows, fields))
+
+
+def dump_row(row: Sequence, fields: Sequence[str]) -> bytes:
+    """
+    Сериализует одну строку (например, из RETURNING) в JSON-объект.
+    """
+    return dump_json(dict(zip(fields, row)))
+
+
+def dump_page(
+    rows: Iterable[Sequence], fields: Sequence[str], next_cursor: str | None
+) -> bytes:
+    """
+    Сериализует страницу в формате схемы Page.
+    """
+    return dump_json(
+        {"items": rows_to_dicts(rows, fields), "next_cursor": next_cursor}
+    )
+
+
+def json_response(content: bytes, headers: dict[str, str] | None = None) -> Response:
+    """
+    Ответ с уже сериализованным телом; FastAPI не проверяет его по response_model.
+    """
+    return Response(content=content, media_type="application/json", headers=headers)
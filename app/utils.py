@@ -1,27 +1,182 @@
-from sqlalchemy import func, select
+from typing import Any
+
+from sqlalchemy import Float, Row, case, cast, func, literal, or_, select, true, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import HTTPException, status
 
 from app.models.reviews import Review
 from app.models.products import Product
+from app.serialization import REVIEW_COLUMNS, REVIEW_FIELDS
+
+GRADES = range(1, 6)
+
+
+def grade_column(grade: int):
+    """
+    Счетчик отзывов товара с оценкой grade (grade_1_count ... grade_5_count).
+    """
+    return getattr(Product, f"grade_{grade}_count")
+
+
+def rating_change(grade: Any, delta: int) -> dict[str, Any]:
+    """
+    Значения для UPDATE товара, учитывающие добавленный (delta=1) или удаленный
+    (delta=-1) отзыв с оценкой grade. grade может быть и числом, и колонкой
+    (например, из CTE с удаленным отзывом).
+    """
+    new_count = Product.rating_count + delta
+    new_sum = Product.rating_sum + grade * delta
+    values = {
+        "rating_sum": new_sum,
+        "rating_count": new_count,
+        "rating": case(
+            (new_count > 0, cast(new_sum, Float) / new_count),
+            else_=0.0,
+        ),
+    }
+    # распределение оценок: для известной оценки меняется один счетчик,
+    # для колонки - каждый счетчик через CASE
+    if isinstance(grade, int):
+        column = grade_column(grade)
+        values[column.key] = column + delta
+    else:
+        for value in GRADES:
+            column = grade_column(value)
+            values[column.key] = column + case((grade == value, delta), else_=0)
+    return values
 
 
-async def update_product_rating(db: AsyncSession, product_id: int) -> None:
+async def insert_review(
+    db: AsyncSession, user_id: int, product_id: int, comment: str | None, grade: int
+) -> Row | None:
     """
-    Обновляет рейтинг продукта на основе среднего оценок из активных отзывов о нем.
+    Создает отзыв и добавляет его оценку в рейтинг товара одним запросом:
+    INSERT ... ON CONFLICT DO NOTHING в CTE (уникальность пары пользователь-товар
+    обеспечивает ограничение uq_reviews_user_id_product_id) + UPDATE товара.
+    Отзыв вставляется, только если товар активен.
+    Возвращает поля отзыва (REVIEW_FIELDS) и category_id товара или None,
+    если товар не найден или отзыв уже есть. Коммит выполняет вызывающий код.
     """
+    inserted = (
+        insert(Review)
+        .from_select(
+            ["user_id", "product_id", "comment", "grade", "comment_date", "is_active"],
+            select(
+                literal(user_id, Review.user_id.type),
+                literal(product_id, Review.product_id.type),
+                literal(comment, Review.comment.type),
+                literal(grade, Review.grade.type),
+                func.now(),
+                true(),
+            ).where(
+                select(Product.id)
+                .where(Product.id == product_id, Product.is_active == True)
+                .exists()
+            ),
+        )
+        .on_conflict_do_nothing(index_elements=[Review.user_id, Review.product_id])
+        .returning(*REVIEW_COLUMNS)
+        .cte("new_review")
+    )
     result = await db.execute(
-        select(func.avg(Review.grade)).where(
-            Review.product_id == product_id,
-            Review.is_active == True,
+        update(Product)
+        .where(Product.id == inserted.c.product_id)
+        .values(**rating_change(inserted.c.grade, 1))
+        .returning(
+            *(inserted.c[field] for field in REVIEW_FIELDS), Product.category_id
         )
+        .execution_options(synchronize_session=False)
     )
-    avg_rating = result.scalar() or 0.0
-    product = await db.get(Product, product_id)
-    if product is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found",
+    return result.first()
+
+
+async def deactivate_review(db: AsyncSession, review_id: int) -> Row | None:
+    """
+    Логически удаляет активный отзыв и вычитает его оценку из рейтинга товара
+    одним запросом (UPDATE отзыва в CTE + UPDATE товара).
+    Возвращает (id, category_id) товара или None, если активного отзыва нет.
+    Коммит выполняет вызывающий код.
+    """
+    deleted = (
+        update(Review)
+        .where(Review.id == review_id, Review.is_active == True)
+        .values(is_active=False)
+        .returning(Review.product_id, Review.grade)
+        .cte("deleted_review")
+    )
+    result = await db.execute(
+        update(Product)
+        .where(Product.id == deleted.c.product_id)
+        .values(**rating_change(deleted.c.grade, -1))
+        .returning(Product.id, Product.category_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
+
+
+async def reconcile_product_ratings(db: AsyncSession) -> int:
+    """
+    Пересчитывает рейтинги и распределение оценок всех товаров по активным
+    отзывам одним запросом и исправляет расхождения со счетчиками.
+    Возвращает число исправленных товаров.
+    """
+    stats = (
+        select(
+            Review.product_id,
+            func.sum(Review.grade).label("grade_sum"),
+            func.count().label("grade_count"),
+            *(
+                func.count().filter(Review.grade == value).label(f"grade_{value}")
+                for value in GRADES
+            ),
         )
-    product.rating = avg_rating
-    await db.commit()
+        .where(Review.is_active == True)
+        .group_by(Review.product_id)
+        .subquery()
+    )
+    actual = (
+        select(
+            Product.id.label("product_id"),
+            func.coalesce(stats.c.grade_sum, 0).label("grade_sum"),
+            func.coalesce(stats.c.grade_count, 0).label("grade_count"),
+            *(
+                func.coalesce(stats.c[f"grade_{value}"], 0).label(f"grade_{value}")
+                for value in GRADES
+            ),
+        )
+        .outerjoin(stats, stats.c.product_id == Product.id)
+        .subquery()
+    )
+    actual_rating = case(
+        (
+            actual.c.grade_count > 0,
+            cast(actual.c.grade_sum, Float) / actual.c.grade_count,
+        ),
+        else_=0.0,
+    )
+    result = await db.execute(
+        update(Product)
+        .where(
+            Product.id == actual.c.product_id,
+            or_(
+                Product.rating_sum != actual.c.grade_sum,
+                Product.rating_count != actual.c.grade_count,
+                Product.rating != actual_rating,
+                *(
+                    grade_column(value) != actual.c[f"grade_{value}"]
+                    for value in GRADES
+                ),
+            ),
+        )
+        .values(
+            rating_sum=actual.c.grade_sum,
+            rating_count=actual.c.grade_count,
+            rating=actual_rating,
+            **{
+                grade_column(value).key: actual.c[f"grade_{value}"]
+                for value in GRADES
+            },
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
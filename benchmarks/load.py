@@ -0,0 +1,522 @@
+"""
+Нагрузочный тест HTTP API.
+
+Запускает app.main:app в отдельном процессе uvicorn на локальном PostgreSQL
+(параметры подключения - те же переменные окружения POSTGRES_*, схема должна
+быть создана через alembic upgrade head), наполняет базу через API
+и в несколько потоков гоняет смешанную нагрузку: просмотр каталога, карточка
+товара, поиск, категории, отзывы, вход, создание отзывов и правка товаров
+продавцами. Для каждого маршрута считаются p50/p95/p99 и пропускная
+способность; результат сохраняется в JSON вместе с хешем коммита, чтобы
+прогоны можно было сравнивать между коммитами.
+
+Запуск:
+    python -m benchmarks.load --duration 30 --concurrency 32
+    python -m benchmarks.load --base-url http://localhost:8000  # уже запущенный сервер
+    python -m benchmarks.load --compare benchmarks/results/old.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+PASSWORD = "benchmark-password"
+
+# Доли операций в смешанной нагрузке
+WORKLOAD = {
+    "browse": 30,
+    "category": 15,
+    "detail": 25,
+    "search": 8,
+    "categories": 5,
+    "reviews": 7,
+    "login": 3,
+    "review": 4,
+    "seller_update": 3,
+}
+
+
+@dataclass
+class Dataset:
+    """
+    Идентификаторы и токены, созданные при наполнении базы.
+    """
+
+    categories: list[int] = field(default_factory=list)
+    products: list[int] = field(default_factory=list)
+    products_by_seller: dict[str, list[int]] = field(default_factory=dict)
+    tokens: dict[str, str] = field(default_factory=dict)
+    sellers: list[str] = field(default_factory=list)
+    buyers: list[str] = field(default_factory=list)
+    # пары (покупатель, товар), для которых отзыв еще не оставлен
+    review_slots: list[tuple[str, int]] = field(default_factory=list)
+    search_terms: list[str] = field(default_factory=list)
+
+
+class Recorder:
+    """
+    Собирает задержки и коды ответов по шаблону маршрута.
+    """
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.enabled = False
+
+    async def request(
+        self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status_code = response.status_code
+        except httpx.HTTPError:
+            response = None
+            status_code = 0
+        elapsed = time.perf_counter() - started
+        if self.enabled:
+            self.latencies[route].append(elapsed)
+            self.statuses[route][status_code] += 1
+        return response
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Перцентиль по методу ближайшего ранга; values должны быть отсортированы.
+    """
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+def summarize(latencies: list[float], statuses: dict[int, int], duration: float) -> dict:
+    values = sorted(latencies)
+    errors = sum(count for code, count in statuses.items() if code == 0 or code >= 500)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(len(values) / duration, 2),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def git_revision() -> dict:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "HEAD") or None,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--no-access-log",
+            "--log-level",
+            "warning",
+        ],
+        env=os.environ.copy(),
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get("/")
+            if response.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("Server did not start in time")
+        await asyncio.sleep(0.2)
+
+
+async def gather_limited(coroutines, limit: int) -> list:
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines))
+
+
+async def register(client: httpx.AsyncClient, email: str, role: str) -> str:
+    response = await client.post(
+        "/users/", json={"email": email, "password": PASSWORD, "role": role}
+    )
+    response.raise_for_status()
+    response = await client.post(
+        "/users/token", data={"username": email, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def seed(client: httpx.AsyncClient, args: argparse.Namespace) -> Dataset:
+    """
+    Наполняет базу через API: пользователи, дерево категорий, товары
+    (массовым импортом) и уникальные пары покупатель-товар для отзывов.
+    Все имена получают префикс прогона, поэтому прогоны не мешают друг другу.
+    """
+    run = uuid.uuid4().hex[:8]
+    dataset = Dataset()
+    dataset.sellers = [f"seller-{run}-{n}@bench.example" for n in range(args.sellers)]
+    dataset.buyers = [f"buyer-{run}-{n}@bench.example" for n in range(args.buyers)]
+
+    tokens = await gather_limited(
+        [register(client, email, "seller") for email in dataset.sellers]
+        + [register(client, email, "buyer") for email in dataset.buyers],
+        args.concurrency,
+    )
+    dataset.tokens = dict(zip(dataset.sellers + dataset.buyers, tokens))
+
+    roots = max(1, args.categories // 5)
+    for number in range(args.categories):
+        parent_id = dataset.categories[number % roots] if number >= roots else None
+        response = await client.post(
+            "/categories/",
+            json={"name": f"Категория {run} {number}", "parent_id": parent_id},
+        )
+        response.raise_for_status()
+        dataset.categories.append(response.json()["id"])
+
+    def tag(email: str) -> str:
+        return f" {run} {email.split('@')[0]} "
+
+    words = ["ноутбук", "телефон", "чайник", "кресло", "лампа", "рюкзак", "часы"]
+    dataset.search_terms = words
+    per_seller = args.products // len(dataset.sellers)
+    for seller in dataset.sellers:
+        lines = [
+            json.dumps(
+                {
+                    "name": f"{random.choice(words)}{tag(seller)}{n}",
+                    "description": f"Описание товара {n}: {' '.join(random.sample(words, 3))}",
+                    "price": round(random.uniform(10, 10000), 2),
+                    "stock": random.randint(0, 500),
+                    "category_id": random.choice(dataset.categories),
+                },
+                ensure_ascii=False,
+            )
+            for n in range(per_seller)
+        ]
+        response = await client.post(
+            "/products/import",
+            content="\n".join(lines).encode(),
+            headers={
+                "Content-Type": "application/x-ndjson",
+                "Authorization": f"Bearer {dataset.tokens[seller]}",
+            },
+            timeout=None,
+        )
+        response.raise_for_status()
+
+    # идентификаторы товаров берем из выгрузки и относим к продавцу по имени
+    dataset.products_by_seller = {seller: [] for seller in dataset.sellers}
+    async with client.stream("GET", "/products/export", timeout=None) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            product = json.loads(line)
+            for seller in dataset.sellers:
+                if tag(seller) in product["name"]:
+                    dataset.products_by_seller[seller].append(product["id"])
+                    dataset.products.append(product["id"])
+                    break
+
+    dataset.review_slots = [
+        (buyer, product_id)
+        for buyer in dataset.buyers
+        for product_id in random.sample(
+            dataset.products, min(len(dataset.products), args.reviews_per_buyer)
+        )
+    ]
+    random.shuffle(dataset.review_slots)
+    return dataset
+
+
+def auth(dataset: Dataset, email: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {dataset.tokens[email]}"}
+
+
+async def operation(
+    name: str, client: httpx.AsyncClient, recorder: Recorder, dataset: Dataset, state: dict
+) -> None:
+    """
+    Выполняет одну операцию нагрузки. state - состояние виртуального
+    пользователя (курсор листания каталога).
+    """
+    if name == "browse":
+        # чаще листаем дальше, иногда начинаем сначала с другой сортировкой
+        if not state.get("cursor") or random.random() < 0.3:
+            state["sort"] = random.choice(["id", "price", "-rating"])
+            state["cursor"] = None
+        params = {"sort": state["sort"], "limit": 20}
+        if state["cursor"]:
+            params["cursor"] = state["cursor"]
+        response = await recorder.request(
+            client, "GET /products/", "GET", "/products/", params=params
+        )
+        state["cursor"] = None
+        if response is not None and response.status_code == 200:
+            state["cursor"] = response.json()["next_cursor"]
+    elif name == "category":
+        await recorder.request(
+            client,
+            "GET /products/category/{category_id}",
+            "GET",
+            f"/products/category/{random.choice(dataset.categories)}",
+        )
+    elif name == "detail":
+        await recorder.request(
+            client,
+            "GET /products/{product_id}",
+            "GET",
+            f"/products/{random.choice(dataset.products)}",
+        )
+    elif name == "search":
+        await recorder.request(
+            client,
+            "GET /products/search",
+            "GET",
+            "/products/search",
+            params={"q": random.choice(dataset.search_terms)},
+        )
+    elif name == "categories":
+        route = random.choice(["/categories/", "/categories/tree"])
+        await recorder.request(client, f"GET {route}", "GET", route)
+    elif name == "reviews":
+        await recorder.request(
+            client,
+            "GET /products/{product_id}/reviews",
+            "GET",
+            f"/products/{random.choice(dataset.products)}/reviews",
+        )
+    elif name == "login":
+        email = random.choice(dataset.buyers + dataset.sellers)
+        await recorder.request(
+            client,
+            "POST /users/token",
+            "POST",
+            "/users/token",
+            data={"username": email, "password": PASSWORD},
+        )
+    elif name == "review":
+        if not dataset.review_slots:
+            return
+        buyer, product_id = dataset.review_slots.pop()
+        await recorder.request(
+            client,
+            "POST /reviews/",
+            "POST",
+            "/reviews/",
+            json={
+                "product_id": product_id,
+                "comment": "Отзыв из нагрузочного теста",
+                "grade": random.randint(1, 5),
+            },
+            headers=auth(dataset, buyer),
+        )
+    elif name == "seller_update":
+        seller = random.choice(dataset.sellers)
+        if not dataset.products_by_seller[seller]:
+            return
+        await recorder.request(
+            client,
+            "PUT /products/{product_id}",
+            "PUT",
+            f"/products/{random.choice(dataset.products_by_seller[seller])}",
+            json={
+                "name": f"Обновленный товар {random.randint(1, 10**6)}",
+                "description": "Изменено нагрузочным тестом",
+                "price": round(random.uniform(10, 10000), 2),
+                "stock": random.randint(0, 500),
+                "category_id": random.choice(dataset.categories),
+            },
+            headers=auth(dataset, seller),
+        )
+
+
+async def virtual_user(
+    base_url: str, recorder: Recorder, dataset: Dataset, deadline: float
+) -> None:
+    names = list(WORKLOAD)
+    weights = list(WORKLOAD.values())
+    state: dict = {}
+    # у каждого виртуального пользователя свой клиент и свои cookie
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            await operation(name, client, recorder, dataset, state)
+
+
+async def run_load(base_url: str, args: argparse.Namespace) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await wait_ready(client)
+        started = time.monotonic()
+        dataset = await seed(client, args)
+        print(
+            f"seeded {len(dataset.products)} products, {len(dataset.categories)} "
+            f"categories, {len(dataset.tokens)} users in {time.monotonic() - started:.1f}s"
+        )
+
+    recorder = Recorder()
+    warmup_deadline = time.monotonic() + args.warmup
+    await asyncio.gather(
+        *(
+            virtual_user(base_url, recorder, dataset, warmup_deadline)
+            for _ in range(args.concurrency)
+        )
+    )
+
+    recorder.enabled = True
+    started = time.monotonic()
+    deadline = started + args.duration
+    await asyncio.gather(
+        *(
+            virtual_user(base_url, recorder, dataset, deadline)
+            for _ in range(args.concurrency)
+        )
+    )
+    duration = time.monotonic() - started
+
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    all_statuses: dict[int, int] = defaultdict(int)
+    for statuses in recorder.statuses.values():
+        for code, count in statuses.items():
+            all_statuses[code] += count
+
+    return {
+        **git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            name: value
+            for name, value in vars(args).items()
+            if name not in ("output", "compare")
+        },
+        "duration_s": round(duration, 2),
+        "total": summarize(all_latencies, all_statuses, duration),
+        "endpoints": {
+            route: summarize(recorder.latencies[route], recorder.statuses[route], duration)
+            for route in sorted(recorder.latencies)
+        },
+    }
+
+
+def print_report(results: dict, baseline: dict | None) -> None:
+    header = f"{'endpoint':40} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}"
+    print(header)
+    print("-" * len(header))
+    rows = [*results["endpoints"].items(), ("TOTAL", results["total"])]
+    for route, stats in rows:
+        line = (
+            f"{route:40} {stats['throughput_rps']:9.1f} {stats['p50_ms']:8.1f} "
+            f"{stats['p95_ms']:8.1f} {stats['p99_ms']:8.1f} {stats['errors']:5}"
+        )
+        if baseline is not None:
+            old = (
+                baseline["total"]
+                if route == "TOTAL"
+                else baseline["endpoints"].get(route)
+            )
+            if old and old["p95_ms"] and old["throughput_rps"]:
+                line += (
+                    f"   p95 {stats['p95_ms'] / old['p95_ms'] - 1:+.0%}"
+                    f"   req/s {stats['throughput_rps'] / old['throughput_rps'] - 1:+.0%}"
+                )
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--base-url", help="Не запускать сервер, а нагружать этот")
+    parser.add_argument("--workers", type=int, default=1, help="Процессы uvicorn")
+    parser.add_argument("--duration", type=float, default=30, help="Секунды замера")
+    parser.add_argument("--warmup", type=float, default=5, help="Секунды прогрева")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--sellers", type=int, default=10)
+    parser.add_argument("--buyers", type=int, default=50)
+    parser.add_argument("--categories", type=int, default=25)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--reviews-per-buyer", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0, help="Seed генератора случайных чисел")
+    parser.add_argument("--output", type=Path, help="Файл результатов (JSON)")
+    parser.add_argument("--compare", type=Path, help="Прежний результат для сравнения")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(port, args.workers)
+    try:
+        results = asyncio.run(run_load(base_url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        commit = (results["commit"] or "unknown")[:12]
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"{stamp}-{commit}.json"
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(results, baseline)
+    print(f"\nresults: {output}")
+
+
+if __name__ == "__main__":
+    main()
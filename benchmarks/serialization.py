@@ -0,0 +1,93 @@
+"""
+Сравнение стоимости сериализации списка товаров на строку.
+
+"before" - прежний путь: строки превращаются в ORM-объекты, затем FastAPI
+проверяет их по response_model (Page[Product]) и кодирует через json.
+"after" - быстрый путь app.serialization: строки колонок сразу в orjson.
+
+База данных не нужна: оба варианта начинают с одинаковых строк результата.
+Запуск: python -m benchmarks.serialization --rows 1000 --repeat 50
+"""
+
+import argparse
+import json
+import time
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+from sqlalchemy.engine.result import result_tuple
+
+from app.models.products import Product as ProductModel
+from app.schemas import Page, Product as ProductSchema
+from app.serialization import PRODUCT_FIELDS, dump_page
+
+page_adapter = TypeAdapter(Page[ProductSchema])
+make_row = result_tuple(PRODUCT_FIELDS)
+
+
+def make_rows(count: int) -> list:
+    return [
+        make_row(
+            (
+                f"Товар {i}",
+                f"Описание товара номер {i}",
+                Decimal("199.90") + i,
+                f"https://example.com/images/{i}.png",
+                i % 50,
+                i % 20 + 1,
+                i,
+                True,
+                4.25,
+            )
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def before(rows: list) -> bytes:
+    products = [ProductModel(**row._asdict()) for row in rows]
+    validated = page_adapter.validate_python(
+        {"items": products, "next_cursor": None}, from_attributes=True
+    )
+    content = page_adapter.dump_python(validated, mode="json")
+    # так же, как fastapi.responses.JSONResponse.render
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def after(rows: list) -> bytes:
+    return dump_page(rows, PRODUCT_FIELDS, None)
+
+
+def measure(func, rows: list, repeat: int) -> float:
+    """
+    Возвращает лучшее время одного прогона в микросекундах на строку.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - started)
+    return best / len(rows) * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    assert json.loads(before(rows)) == json.loads(after(rows))
+
+    before_us = measure(before, rows, args.repeat)
+    after_us = measure(after, rows, args.repeat)
+    print(f"rows per page: {args.rows}")
+    print(f"before (ORM + response_model): {before_us:8.2f} us/row")
+    print(f"after  (rows + orjson):        {after_us:8.2f} us/row")
+    print(f"speedup: {before_us / after_us:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+import uuid
+
+import pytest
+
+# Настройки по умолчанию, чтобы app импортировался без .env;
+# переменные окружения и .env имеют приоритет
+for name, value in {
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "fastapi_exam_test",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "SECRET_KEY": "test-secret-key",
+    # шина инвалидации нужна только между процессами и держит свое соединение
+    "INVALIDATION_BUS_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+from fastapi.testclient import TestClient
+
+from app.cache import category_cache, principal_cache, product_cache
+from app.category_snapshot import category_snapshot
+from app.main import app
+
+
+@pytest.fixture
+def client():
+    """
+    Клиент без запуска lifespan: фоновые задачи и слушатель инвалидаций
+    тестам не нужны.
+    """
+    return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    for cache in (product_cache, category_cache, principal_cache):
+        cache.clear()
+
+
+async def _database_available() -> bool:
+    from sqlalchemy import text
+
+    from app.database import async_engine
+
+    try:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+    finally:
+        # соединения привязаны к event loop этой проверки
+        await async_engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    Пропускает тест, если PostgreSQL из настроек недоступен.
+    С TEST_DATABASE_REQUIRED=1 (в CI) недоступная база - ошибка, а не пропуск.
+    """
+    if not asyncio.run(_database_available()):
+        if os.getenv("TEST_DATABASE_REQUIRED"):
+            pytest.fail("PostgreSQL is not available")
+        pytest.skip("PostgreSQL is not available")
+
+
+@pytest.fixture
+def db_client(database):
+    """
+    Клиент с lifespan: все запросы теста идут в одном event loop, поэтому
+    соединения пула переиспользуются. Первая загрузка снимка категорий
+    дожидается до начала теста, чтобы не попасть в подсчет запросов.
+    """
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 5
+        while not category_snapshot.refreshes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        yield client
+
+
+async def _seed_product() -> dict[str, int]:
+    from app.database import async_session_maker
+    from app.models.categories import Category as CategoryModel
+    from app.models.products import Product as ProductModel
+    from app.models.users import User as UserModel
+
+    suffix = uuid.uuid4().hex[:12]
+    async with async_session_maker() as session:
+        seller = UserModel(
+            email=f"seller-{suffix}@example.com", hashed_password="-", role="seller"
+        )
+        category = CategoryModel(name=f"Category {suffix}")
+        session.add_all([seller, category])
+        await session.flush()
+        category.path = CategoryModel.child_path(None, category.id)
+        product = ProductModel(
+            name=f"Product {suffix}",
+            price=10,
+            stock=5,
+            category_id=category.id,
+            seller_id=seller.id,
+        )
+        session.add(product)
+        await session.commit()
+        return {"product_id": product.id, "category_id": category.id}
+
+
+@pytest.fixture
+def seeded_product(db_client) -> dict[str, int]:
+    """
+    Активный товар в новой активной категории (уникальные имена, как
+    в benchmarks/load.py, так что база между прогонами не очищается).
+    """
+    return db_client.portal.call(_seed_product)
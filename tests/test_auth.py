@@ -0,0 +1,39 @@
+import asyncio
+import threading
+
+from app.auth import PasswordHasherPool
+
+
+def test_pending_follows_thread_job_after_cancel():
+    pool = PasswordHasherPool(workers=1, max_queue=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_hash() -> str:
+        started.set()
+        release.wait(5)
+        return "hash"
+
+    async def scenario() -> None:
+        running = asyncio.create_task(pool.run(slow_hash))
+        queued = asyncio.create_task(pool.run(slow_hash))
+        await asyncio.to_thread(started.wait, 5)
+        assert pool.pending == 2
+
+        # клиенты отключились: начатая задача продолжает занимать поток,
+        # а задача из очереди отменяется и место освобождается
+        running.cancel()
+        queued.cancel()
+        await asyncio.sleep(0.01)
+        assert pool.pending == 1
+        assert pool.stats()["in_flight"] == 1
+
+        release.set()
+        for _ in range(100):
+            if pool.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.pending == 0
+        assert pool.completed == 1
+
+    asyncio.run(scenario())
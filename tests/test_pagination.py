@@ -0,0 +1,35 @@
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import MAX_ID, decode_cursor, encode_cursor
+from app.routers.products import PRODUCT_SORTS
+
+
+def test_decode_cursor():
+    cursor = encode_cursor("id", 10, 10)
+    assert decode_cursor(cursor, "id", PRODUCT_SORTS["id"]) == (10, 10)
+
+
+@pytest.mark.parametrize(
+    "sort, key_value, id_value",
+    [
+        ("id", 1, MAX_ID + 1),
+        ("id", 1, 0),
+        ("id", 1, True),
+        ("id", 2**40, 1),
+        ("id", "1", 1),
+        ("price", "10.00", 2**40),
+    ],
+)
+def test_decode_cursor_rejects_out_of_range(sort, key_value, id_value):
+    # такие значения asyncpg не передал бы в колонку Integer (ответ 500)
+    cursor = encode_cursor(sort, key_value, id_value)
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, sort, PRODUCT_SORTS[sort])
+    assert error.value.status_code == 400
+
+
+def test_decode_cursor_rejects_other_sort():
+    cursor = encode_cursor("price", "10.00", 1)
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor, "id", PRODUCT_SORTS["id"])
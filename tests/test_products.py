@@ -0,0 +1,68 @@
+import orjson
+import pytest
+
+from app.cache import product_cache
+from app.query_budget import assert_max_queries, get_query_budget
+from app.routers.products import get_product, get_products_by_category
+
+PRODUCT = {
+    "id": 1,
+    "name": "Product",
+    "description": None,
+    "price": 10.0,
+    "image_url": None,
+    "stock": 5,
+    "category_id": 1,
+    "is_active": True,
+    "rating": 0.0,
+}
+
+
+def budget(endpoint) -> int:
+    return get_query_budget(endpoint)[0]
+
+
+def test_get_product_from_cache_without_queries(client):
+    # в кэше лежит уже сериализованная карточка
+    product_cache.set(("product", 1), ('"v1"', orjson.dumps(PRODUCT)))
+
+    with assert_max_queries(0):
+        response = client.get("/products/1")
+        not_modified = client.get("/products/1", headers={"If-None-Match": '"v1"'})
+
+    assert response.status_code == 200
+    assert response.json() == PRODUCT
+    assert response.headers["ETag"] == '"v1"'
+    assert not_modified.status_code == 304
+
+
+@pytest.mark.db
+def test_get_product_uncached_within_budget(db_client, seeded_product):
+    product_id = seeded_product["product_id"]
+
+    with assert_max_queries(budget(get_product)):
+        response = db_client.get(f"/products/{product_id}")
+
+    assert response.status_code == 200
+    assert response.json()["id"] == product_id
+
+
+@pytest.mark.db
+def test_get_product_missing_within_budget(db_client):
+    with assert_max_queries(budget(get_product)):
+        response = db_client.get("/products/2147483647")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.db
+def test_get_products_by_category_uncached_within_budget(db_client, seeded_product):
+    category_id = seeded_product["category_id"]
+
+    with assert_max_queries(budget(get_products_by_category)):
+        response = db_client.get(f"/products/category/{category_id}")
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()["items"]] == [
+        seeded_product["product_id"]
+    ]
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.query_budget import assert_max_queries
+
+
+@pytest.fixture
+def engines():
+    engines = [create_engine("sqlite://"), create_engine("sqlite://")]
+    yield engines
+    for engine in engines:
+        engine.dispose()
+
+
+def execute(engine, count: int = 1) -> None:
+    with engine.connect() as connection:
+        for _ in range(count):
+            connection.execute(text("SELECT 1"))
+
+
+def test_within_budget(engines):
+    with assert_max_queries(2, engines) as statements:
+        execute(engines[0], 2)
+    assert statements == ["SELECT 1", "SELECT 1"]
+
+
+def test_over_budget(engines):
+    with pytest.raises(AssertionError, match="got 3"):
+        with assert_max_queries(2, engines):
+            execute(engines[0], 3)
+
+
+def test_counts_queries_on_every_engine(engines):
+    # запросы к репликам входят в тот же бюджет
+    with pytest.raises(AssertionError):
+        with assert_max_queries(1, engines):
+            execute(engines[0])
+            execute(engines[1])
+
+
+def test_listeners_removed(engines):
+    with assert_max_queries(1, engines) as statements:
+        pass
+    execute(engines[0])
+    assert statements == []
+
+
+def test_default_engines():
+    from app.database import async_engine, read_engines
+
+    with assert_max_queries(0) as statements:
+        for engine in (async_engine, *read_engines):
+            engine.sync_engine.dispatch.after_cursor_execute(
+                None, None, "SELECT 1", {}, None, False
+            )
+        # сработавшие слушатели подтверждают, что подписаны все движки
+        assert len(statements) == 1 + len(read_engines)
+        statements.clear()
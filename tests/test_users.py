@@ -0,0 +1,24 @@
+import uuid
+
+import pytest
+
+from app.auth import password_hasher
+from app.query_budget import assert_max_queries, get_query_budget
+from app.routers.users import create_user
+
+
+@pytest.mark.db
+def test_create_user_within_budget(db_client):
+    max_queries = get_query_budget(create_user)[0]
+    user = {"email": f"buyer-{uuid.uuid4().hex[:12]}@example.com", "password": "password"}
+
+    with assert_max_queries(max_queries):
+        response = db_client.post("/users/", json=user)
+    assert response.status_code == 201
+
+    # занятый email отклоняется до bcrypt
+    hashed = password_hasher.completed
+    with assert_max_queries(max_queries):
+        duplicate = db_client.post("/users/", json=user)
+    assert duplicate.status_code == 409
+    assert password_hasher.completed == hashed